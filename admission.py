@@ -0,0 +1,90 @@
+import os
+import resource
+import time
+from settings import *
+from exceptions import OverloadedException
+from game.logger_conf import server_logger
+
+
+def get_memory_usage():
+    """ Returns resident memory of the process in MB """
+    try:
+        with open("/proc/self/statm") as statm:
+            rss_pages = int(statm.read().split()[1])
+        return rss_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10     # peak, KB on Linux
+
+
+class AdmissionController:
+    """
+    Measures CPU, memory and loop lag of the server process every ADMISSION_SAMPLE_INTERVAL seconds.
+    Loop lag is how late the sampling timer runs. While any of the limits is exceeded new connections
+    and rooms are rejected, clients that are already playing are not affected.
+    """
+
+    def __init__(self, max_cpu=ADMISSION_MAX_CPU, max_memory=ADMISSION_MAX_MEMORY,
+                 max_loop_lag=ADMISSION_MAX_LOOP_LAG, max_connections=MAX_CONNECTIONS,
+                 interval=ADMISSION_SAMPLE_INTERVAL):
+        self.max_cpu = max_cpu
+        self.max_memory = max_memory
+        self.max_loop_lag = max_loop_lag
+        self.max_connections = max_connections
+        self.interval = interval
+        self.timers = None
+        self.expected = None        # time the sampling timer should run
+        self.cpu_time = time.process_time()
+        self.wall_time = time.monotonic()
+        self.stats = {"cpu": 0.0, "memory": 0.0, "loop_lag": 0.0}
+        self.overload = None        # reason of rejecting, None if server accepts new load
+        self.draining = False       # server is restarting, running games are finished by this process
+
+    def start(self, timers):
+        """ Sample periodically using timers (TimerWheel or LoopTimers) of the loop that handles the lobby """
+        self.timers = timers
+        self.schedule()
+
+    def schedule(self):
+        self.expected = time.monotonic() + self.interval
+        self.timers.schedule(self.interval, self.sample)
+
+    def sample(self):
+        """ Timer callback. Measure the process and decide if new load is accepted """
+        now = time.monotonic()
+        cpu_time = time.process_time()
+        self.stats = {
+            "cpu": round(100 * (cpu_time - self.cpu_time) / max(now - self.wall_time, 1e-6), 1),
+            "memory": round(get_memory_usage(), 1),
+            "loop_lag": round(max(now - self.expected, 0), 4),
+        }
+        self.cpu_time = cpu_time
+        self.wall_time = now
+
+        overload = None
+        if self.max_cpu and self.stats["cpu"] > self.max_cpu:
+            overload = "CPU usage {}%".format(self.stats["cpu"])
+        elif self.max_memory and self.stats["memory"] > self.max_memory:
+            overload = "memory usage {} MB".format(self.stats["memory"])
+        elif self.max_loop_lag and self.stats["loop_lag"] > self.max_loop_lag:
+            overload = "loop lag {} s".format(self.stats["loop_lag"])
+
+        if overload != self.overload:
+            if overload is not None:
+                server_logger.warning(f"Server overloaded ({overload}), new connections and rooms are rejected")
+            else:
+                server_logger.info(f"Server accepts new connections and rooms again {self.stats}")
+            self.overload = overload
+        self.schedule()
+
+    def admit_connection(self, nconnections):
+        """ Raise OverloadedException if new connection should be rejected """
+        if self.max_connections and nconnections >= self.max_connections:
+            raise OverloadedException("Too many connections")
+        self.admit_room()
+
+    def admit_room(self):
+        """ Raise OverloadedException if new room should not be created """
+        if self.draining:
+            raise OverloadedException("Server is restarting")
+        if self.overload is not None:
+            raise OverloadedException("Server is overloaded")
@@ -0,0 +1,227 @@
+import asyncio
+import signal
+import sys
+import time
+from common import *
+from settings import *
+import tracing
+from exceptions import *
+from rooms import RoomManager
+from admission import AdmissionController
+from server import Client, Connection, parse_address
+from game.logger_conf import server_logger, server_fh, game_fh, network_fh
+import daemon
+
+
+async_connections = {}     # AsyncConnection: reader task, all clients handled by asyncio server
+
+
+async def recvTlvAsync(reader, protocol=PROTOCOL_V1, peer=None):
+    """
+    Read next TLV message from the stream. Raise asyncio.IncompleteReadError if stream has been closed.
+    Raise ClearClientException if length header is malformed, stream can not be decoded anymore.
+    Raise ValueError if message contains unknown tag, the message is skipped.
+    """
+    if protocol != PROTOCOL_V1:
+        header_bytes = await reader.readexactly(V2_LENGTH.size)
+        header = V2_LENGTH.unpack(header_bytes)[0]
+        msg_len = header & V2_LENGTH_MASK
+        if msg_len > MAX_MSG_LEN:
+            raise ClearClientException("Message length {} out of range".format(msg_len))
+        body = await reader.readexactly(msg_len)
+        if tracing.enabled:
+            tracing.record(tracing.RECEIVED, peer, protocol, header_bytes + body)
+        if header & V2_COMPRESSED:     # clients do not compress
+            body = decompress_body(None, body, header)
+        return decode_tlv_v2(body)
+
+    header = await reader.readexactly(LENGTH_LEN)
+    try:
+        msg_len = int(header)
+    except ValueError:
+        raise ClearClientException("Malformed message length")
+    if not 0 <= msg_len <= MAX_MSG_LEN:
+        raise ClearClientException("Message length {} out of range".format(msg_len))
+    msg = await reader.readexactly(msg_len)
+    if tracing.enabled:
+        tracing.record(tracing.RECEIVED, peer, protocol, header + msg)
+    return parse_tlv_msg(msg.decode("utf-8"))
+
+
+class LoopTimers:
+    """ Timers scheduled on the running asyncio loop, same interface as TimerWheel.schedule """
+
+    def schedule(self, delay, callback, *args):
+        return asyncio.get_running_loop().call_later(delay, callback, *args)
+
+
+class AsyncDontGetAngryServer:
+    """
+    Lobby and all the games run on one asyncio event loop, there is no thread per game.
+    Speaks the same TLV protocol as DontGetAngryServer.
+    """
+
+    def __init__(self, host, port):
+        self.HOST = host
+        self.PORT = port
+        self.room_manager = RoomManager()
+        self.admission = AdmissionController()
+        self.room_manager.admission = self.admission
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            server_logger.info("Closing...")
+            sys.exit(1)
+
+    async def run(self):
+        self.admission.start(LoopTimers())
+        if hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.dump_trace)
+        host = self.HOST if self.HOST != INADDR_ANY else None     # None binds to all interfaces
+        try:
+            server = await asyncio.start_server(self.accept_connection, host, self.PORT,
+                                                backlog=BACKLOG, reuse_address=True)
+        except OSError as e:
+            server_logger.error(f"Bind socket error: {str(e)}")
+            sys.exit(1)
+
+        sockinfo = [sock.getsockname() for sock in server.sockets]
+        server_logger.info(f"Listinig on {sockinfo} (asyncio) ...")
+        async with server:
+            await server.serve_forever()
+
+    def dump_trace(self):
+        """ Write traced frames to the network log. Called on SIGUSR1 """
+        if tracing.enabled:
+            tracing.dump("SIGUSR1")
+
+    async def accept_connection(self, reader, writer):
+        """ Called for every new connection. Reads messages until client disconnects. """
+        addr = writer.get_extra_info("peername")
+        try:
+            self.admission.admit_connection(len(async_connections))
+        except OverloadedException as e:
+            server_logger.warning(f"Connection from {addr} rejected: {str(e)}")
+            writer.write(frame_tlv(add_tlv_tag(TLV_FAIL_TAG, f"{str(e)}, try again later")))
+            writer.close()
+            return
+        cli = Client(writer.get_extra_info("socket"), addr)
+        conn = AsyncConnection(cli, reader, writer)
+        async_connections[conn] = asyncio.current_task()
+        server_logger.info(f"Connection from: {addr}")
+
+        try:
+            await conn.read_loop()
+        finally:
+            self.client_disconnect(conn)
+
+    def client_disconnect(self, conn):
+        server_logger.info(f"Client {conn.cli} disconnected")
+        del async_connections[conn]
+        if conn.game is not None:
+            conn.game.player_disconnected(conn)
+        else:
+            self.room_manager.disconnect_client(conn)
+        conn.close()
+
+
+class AsyncConnection(Connection):
+    """ Connection served by the asyncio server. Writes go to the StreamWriter buffer and never block the loop. """
+
+    def __init__(self, cli, reader, writer):
+        super().__init__(cli, writer.get_extra_info("socket"))
+        self.reader = reader
+        self.writer = writer
+        self.timers = LoopTimers()
+        self.batch = []     # frames queued during current iteration of the loop
+
+    async def read_loop(self):
+        if LOBBY_IDLE_TIMEOUT > 0:
+            self.idle_timer = self.timers.schedule(LOBBY_IDLE_TIMEOUT, self.check_idle)
+        while True:
+            try:
+                tlv = await recvTlvAsync(self.reader, self.protocol, self.cli.addr)
+                self.last_activity = time.monotonic()
+            except (asyncio.IncompleteReadError, OSError, ClearClientException) as e:
+                server_logger.error(f"Error while reading message: {str(e)}")
+                if isinstance(e, ClearClientException):
+                    tracing.dump_error(self.cli.addr, e)
+                return
+            except ValueError as e:
+                server_logger.error(f"Unknown tag received")
+                tracing.dump_error(self.cli.addr, e)
+                continue
+
+            try:
+                if self.game is not None:
+                    self.game.handle_msg(self, tlv)
+                else:
+                    self.handle_tlv(tlv)
+                await self.writer.drain()
+            except (EOFError, OSError, ClearClientException) as e:
+                server_logger.error(f"Error while handling message: {str(e)}")
+                return
+            except ValueError as e:
+                server_logger.error(f"Unknown tag received")
+
+    def check_idle(self):
+        """ Timer callback. Close lobby connection that has not sent anything for LOBBY_IDLE_TIMEOUT """
+        if self.game is not None or self.writer.is_closing():
+            return
+        idle = time.monotonic() - self.last_activity
+        if idle < LOBBY_IDLE_TIMEOUT:
+            self.idle_timer = self.timers.schedule(LOBBY_IDLE_TIMEOUT - idle, self.check_idle)
+            return
+
+        server_logger.info(f"Client {repr(self.cli)} idle for {int(idle)} seconds")
+        self.snd_notification(TLV_INFO_TAG, "Disconnected after {} seconds of inactivity".format(int(idle)))
+        self.close()    # read loop ends and disconnects the client
+
+    def send_frame(self, frame):
+        if not WRITE_COALESCING:
+            self.writer.write(frame)
+            self.bytes_sent += len(frame)
+            self.check_slow()
+            return
+        if not self.batch:
+            asyncio.get_running_loop().call_soon(self.write_batch_frames)
+        self.batch.append(frame)
+
+    def write_batch_frames(self):
+        """ Loop callback. Write messages queued during the last iteration with one call """
+        if not self.batch:
+            return
+        frames, self.batch = self.batch, []
+        if self.writer.is_closing():
+            return
+        self.writer.writelines(frames)
+        self.bytes_sent += sum(len(frame) for frame in frames)
+        try:
+            self.check_slow()
+        except ClearClientException as e:
+            server_logger.error(f"Slow client {repr(self.cli)}: {str(e)}")
+            self.close()    # read loop ends and disconnects the client
+
+    def queued_bytes(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def get_send_stats(self):
+        stats = super().get_send_stats()
+        stats["queued_msgs"] = None     # transport keeps bytes only
+        return stats
+
+    def close(self, timeout=CLOSE_FLUSH_TIMEOUT):
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+            self.idle_timer = None
+        self.congested.discard(self)
+        self.release_nickname()
+        self.write_batch_frames()
+        self.writer.close()     # transport writes queued data before closing
+
+
+if __name__ == "__main__":
+    addr, port = parse_address(sys.argv)
+
+    with daemon.DaemonContext(files_preserve=[server_fh, game_fh, network_fh]):
+        serverDGA = AsyncDontGetAngryServer(addr, port)
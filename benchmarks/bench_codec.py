@@ -0,0 +1,213 @@
+"""
+Per-call cost of the codec and framing functions of common.py, with JSON output and comparison
+against a stored baseline.
+
+Measured as the server and client call them, with network logging disabled so that file writes do
+not make the results noisy; --log measures with the logging configured in game/logger_conf.py.
+Frame tracing (tracing.py) is measured as configured, DGA_TRACE_FRAMES=1 measures it enabled.
+    create_msg              length header for a v1 TLV string
+    add_tlv_tag             one tag message, encoded to the v1 frame
+    build_tlv_with_tags     message from a dictionary, encoded to the v1 / v2 frame
+    sendTlv, recvTlv        one message over a socketpair, v1 / v2 framing. Sends go in batches
+                            of BATCH frames, then the other end reads them, so the two are timed apart.
+Payloads: nickname, room number, roll result with option lists, full player status of a 4 player game.
+Each result is the best of REPEAT rounds over all the cases, in microseconds per call. Every round
+also times fixed reference work, the comparison divides by it to take out the speed of the machine.
+
+Usage: python3 benchmarks/bench_codec.py [-n iterations] [--log] [--json results.json]
+                                         [--compare baseline.json] [--tolerance 0.25]
+With --compare, exits with status 1 if any case is slower than the baseline by more than tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import time
+import timeit
+
+CWD = os.getcwd()     # --json and --compare paths are relative to it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+from common import *
+from game.game import Game
+from game.logger_conf import network_logger
+
+ITERATIONS = 5000
+REPEAT = 7
+BATCH = 32
+TOLERANCE = 0.25    # sub-microsecond cases vary by 10-20 % between runs
+REFERENCE = "reference"
+
+sockets = []    # socketpairs of the sendTlv / recvTlv cases
+
+
+def player_status():
+    game = Game(["Alice", "Bob", "Carol", "Dave"], 40)
+    game.start_game()
+    for player in game.players[:3]:
+        player.place_figure(game.game_board)
+    return game.get_player_status(game.players[0])
+
+
+PAYLOADS = {
+    "NICKNAME": {TLV_NICKNAME_TAG: "Alice"},
+    "ROOM": {TLV_ROOM_TAG: "3"},
+    "ROLLDICERESULT": {TLV_OK_TAG: "ok", TLV_ROLLDICERESULT_TAG: "6",
+                       TLV_OPTION_MOVE: ["Alice-0", "Alice-2"], TLV_OPTION_PUT: ["Alice-1", "Alice-3"]},
+    "PLAYERSTATUS": {TLV_INFO_TAG: player_status()},
+}
+
+
+def timed(func, iterations):
+    """ Returns function that takes one timing of func, seconds per call """
+    def run_once():
+        return timeit.timeit(func, number=iterations) / iterations
+    return run_once
+
+
+def timed_socket(tlv, protocol, iterations):
+    """ Returns function that takes one timing of sendTlv and recvTlv over the socketpair, seconds per call """
+    writer, reader = socket.socketpair()
+    sockets.extend((writer, reader))
+    batches = max(iterations // BATCH, 1)
+
+    def run_once():
+        send_time = recv_time = 0
+        for _ in range(batches):
+            start = time.perf_counter()
+            for _ in range(BATCH):
+                sendTlv(writer, tlv, protocol)
+            send_time += time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(BATCH):
+                recvTlv(reader, protocol)
+            recv_time += time.perf_counter() - start
+        return send_time / (batches * BATCH), recv_time / (batches * BATCH)
+    return run_once
+
+
+def recv_frame(frame, protocol):
+    writer, reader = socket.socketpair()
+    with writer, reader:
+        writer.sendall(frame)
+        return recvTlv(reader, protocol)
+
+
+def parse_expected(data_dict, protocol):
+    """ Dictionary as recvTlv returns it, lists serialized, upper case in v1 """
+    expected = {tag: serialize_list(value) if isinstance(value, list) else value for tag, value in data_dict.items()}
+    if protocol == PROTOCOL_V1:
+        expected = {tag: value.upper() for tag, value in expected.items()}
+    return expected
+
+
+def reference_work():
+    """ Fixed string and dict work, its cost tells how fast the machine is at the moment """
+    values = {str(i): "value{}".format(i) for i in range(8)}
+    return "|".join(key + value.upper() for key, value in values.items()).encode("ascii")
+
+
+def get_cases(iterations):
+    """ Returns list of (case names, timing function), socket cases have names for sendTlv and recvTlv """
+    cases = [((REFERENCE,), timed(reference_work, iterations))]
+    for name, data_dict in PAYLOADS.items():
+        if len(data_dict) == 1:
+            tag, value = next(iter(data_dict.items()))
+            tlv_string = encode_tlv(data_dict)
+            cases.append(((f"create_msg/{name}",), timed(lambda msg=tlv_string: create_msg(msg), iterations)))
+            cases.append(((f"add_tlv_tag/{name}/v1",),
+                          timed(lambda tag=tag, value=value: add_tlv_tag(tag, value).get_frame(), iterations)))
+        for protocol in (PROTOCOL_V1, PROTOCOL_V2):
+            version = f"v{protocol}"
+            assert recv_frame(encode_frame(data_dict, protocol), protocol) == parse_expected(data_dict, protocol)
+            cases.append(((f"build_tlv_with_tags/{name}/{version}",),
+                          timed(lambda data_dict=data_dict, protocol=protocol:
+                                build_tlv_with_tags(data_dict).get_frame(protocol), iterations)))
+            cases.append(((f"sendTlv/{name}/{version}", f"recvTlv/{name}/{version}"),
+                          timed_socket(build_tlv_with_tags(data_dict), protocol, iterations)))
+    return cases
+
+
+def run(iterations):
+    """
+    Returns case name: us per call, the best of REPEAT rounds. Every round times all the cases,
+    so a slow moment of the machine does not spoil all timings of one case.
+    """
+    cases = get_cases(iterations)
+    results = {}
+    try:
+        for _ in range(REPEAT):
+            for names, run_once in cases:
+                costs = run_once()
+                for case, cost in zip(names, costs if len(names) > 1 else (costs,)):
+                    results[case] = min(results.get(case, cost), cost)
+    finally:
+        for sock in sockets:
+            sock.close()
+    return {case: cost * 1e6 for case, cost in results.items()}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints results next to the baseline, returns names of the cases slower than tolerance allows.
+    Change is relative to the reference work of the same run, so it does not depend on how fast
+    the machine was when the baseline was taken.
+    """
+    regressions = []
+    speed = results[REFERENCE] / baseline[REFERENCE]
+    print(f"machine speed compared with the baseline: {1 / speed:.2f}x")
+    print(f"{'case':>40} {'baseline [us]':>14} {'now [us]':>9} {'change':>8}")
+    for case, cost in results.items():
+        old = baseline.get(case)
+        if case == REFERENCE:
+            continue
+        if old is None:
+            print(f"{case:>40} {'-':>14} {cost:>9.2f} {'new':>8}")
+            continue
+        change = cost / (old * speed) - 1
+        mark = ""
+        if change > tolerance:
+            regressions.append(case)
+            mark = "  REGRESSION"
+        print(f"{case:>40} {old:>14.2f} {cost:>9.2f} {change:>+7.0%}{mark}")
+    for case in baseline.keys() - results.keys():
+        print(f"{case:>40} {baseline[case]:>14.2f} {'-':>9} {'removed':>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codec and framing benchmark of common.py")
+    parser.add_argument("-n", "--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--log", action="store_true", help="keep network logging enabled")
+    parser.add_argument("--json", help="write results to the file")
+    parser.add_argument("--compare", help="baseline written by --json")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown, 0.25 is 25%%")
+    args = parser.parse_args()
+
+    network_logger.disabled = not args.log
+    results = run(args.iterations)
+    if args.json:
+        with open(os.path.join(CWD, args.json), "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "iterations": args.iterations, "log": args.log, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(os.path.join(CWD, args.compare)) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        return
+
+    print(f"iterations: {args.iterations}, network logging: {'on' if args.log else 'off'}")
+    print(f"{'case':>40} {'[us]':>9}")
+    for case, cost in results.items():
+        print(f"{case:>40} {cost:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+CPU cost and bytes saved by per-connection compression of server messages, lobby with 1000 rooms.
+
+Room list is built by RoomManager.get_rooms_description from real Room objects. A lobby client
+asks for the list LISTS times while players join rooms, the frames go through one FrameCompressor
+as they would on one connection, so later lists are compressed against the earlier ones.
+Welcome message (the list with a greeting) and a text player status are measured the same way.
+Frames shorter than COMPRESSION_THRESHOLD are not compressed by the server, ROLLDICERESULT is shown
+for comparison.
+
+Usage: python3 benchmarks/bench_compression.py [rooms]
+"""
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+from common import *
+from settings import COMPRESSION_THRESHOLD, MAX_CLIENTS_PER_ROOM
+from rooms import Room, RoomManager
+from game.game import Game
+
+ROOMS = 1000
+LISTS = 20
+LEVELS = (1, 6, 9)
+
+
+def build_lobby(nrooms):
+    room_manager = RoomManager()
+    room_manager.rooms = {}
+    for rnum in range(1, nrooms + 1):
+        room = Room(rnum)
+        room.room_members = [None] * random.randint(0, MAX_CLIENTS_PER_ROOM)
+        room_manager.rooms[rnum] = room
+    return room_manager
+
+
+def room_lists(room_manager, count):
+    """ Room list frames while players join and leave rooms between the requests """
+    frames = []
+    rooms = list(room_manager.rooms.values())
+    for _ in range(count):
+        for room in random.sample(rooms, 20):
+            room.room_members = [None] * random.randint(0, MAX_CLIENTS_PER_ROOM)
+        frames.append(encode_frame({TLV_INFO_TAG: room_manager.get_rooms_description()}, PROTOCOL_V2))
+    return frames
+
+
+def player_status_frames(count):
+    game = Game(["Alice", "Bob", "Carol", "Dave"], 40)
+    game.start_game()
+    frames = []
+    for i in range(count):
+        player = game.players[i % len(game.players)]
+        if player.start_figures and random.random() < 0.3:
+            player.place_figure(game.game_board)
+        frames.append(encode_frame({TLV_INFO_TAG: game.get_player_status(player)}, PROTOCOL_V2))
+    return frames
+
+
+def measure(frames, level, zdict=True):
+    """ Returns (raw bytes, compressed bytes, compress us per frame, decompress us per frame) """
+    compressor = FrameCompressor(level)
+    if not zdict:
+        compressor.compressor = zlib.compressobj(level)
+    start = time.perf_counter()
+    compressed = [compressor.compress_frame(frame) for frame in frames]
+    compress_time = time.perf_counter() - start
+
+    decompressor = FrameDecompressor()
+    if not zdict:
+        decompressor.decompressor = zlib.decompressobj()
+    start = time.perf_counter()
+    for frame in compressed:
+        header = V2_LENGTH.unpack_from(frame)[0]
+        decompressor.decompress(frame[V2_LENGTH.size:], zdict and header & V2_STREAM_START)
+    decompress_time = time.perf_counter() - start
+
+    return (sum(map(len, frames)), sum(map(len, compressed)),
+            compress_time / len(frames) * 1e6, decompress_time / len(frames) * 1e6)
+
+
+def main():
+    nrooms = int(sys.argv[1]) if len(sys.argv) > 1 else ROOMS
+    random.seed(1)
+    room_manager = build_lobby(nrooms)
+    lists = room_lists(room_manager, LISTS)
+    welcome = encode_frame({TLV_OK_TAG: "\n****Welcome, you have connected to the server****\n" +
+                                        room_manager.get_rooms_description()}, PROTOCOL_V2)
+    cases = {
+        f"first list ({nrooms} rooms)": lists[:1],
+        f"next {LISTS - 1} lists": lists,
+        "welcome": [welcome],
+        "player status x100": player_status_frames(100),
+    }
+
+    print(f"rooms: {nrooms}, threshold: {COMPRESSION_THRESHOLD} B")
+    print(f"{'message':>26} {'level':>5} {'dict':>5} {'raw [B]':>9} {'zlib [B]':>9} {'ratio':>6} "
+          f"{'comp [us]':>10} {'decomp [us]':>12}")
+    for name, frames in cases.items():
+        for level in LEVELS:
+            for zdict in (False, True):
+                raw, compressed, compress_us, decompress_us = measure(frames, level, zdict)
+                if name.startswith("next"):     # only the lists after the first one
+                    first = measure(frames[:1], level, zdict)
+                    raw, compressed = raw - first[0], compressed - first[1]
+                print(f"{name:>26} {level:>5} {'yes' if zdict else 'no':>5} {raw:>9} {compressed:>9} "
+                      f"{raw / compressed:>5.1f}x {compress_us:>10.1f} {decompress_us:>12.1f}")
+
+    small = encode_frame({TLV_OK_TAG: "ok", TLV_ROLLDICERESULT_TAG: "6", TLV_OPTION_MOVE: ["Alice-0"]}, PROTOCOL_V2)
+    print(f"ROLLDICERESULT: {len(small)} B, sent uncompressed (below threshold)")
+
+
+if __name__ == "__main__":
+    main()
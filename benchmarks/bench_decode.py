@@ -0,0 +1,122 @@
+"""
+Cost of FrameDecoder.next_frame compared with lazy parsing over the same receive buffer.
+
+The lazy parser only finds where the values are (offsets in a copy of the frame taken through
+a memoryview of the buffer) and decodes a value when it is read, like a handler would. Both are
+measured reading one value ("read") and reading nothing ("unread", e.g. nickname sent with
+ROLLDICE that the game ignores).
+
+Usage: python3 benchmarks/bench_decode.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+from common import *
+
+ITERATIONS = 20000
+REPEAT = 9
+
+MESSAGES = {
+    "ROLLDICE": {TLV_ROLLDICE_TAG: "Player1"},
+    "MOVEFIGURE": {TLV_MOVEFIGURE_TAG: "Player1-2"},
+    "NICKNAME": {TLV_NICKNAME_TAG: "Player1", TLV_PROTOCOL_TAG: "2"},
+    "INFO": {TLV_INFO_TAG: "x" * 500},
+}
+
+TLV_TAG_BYTES = {tag.encode("ascii"): tag for tag in TLV_TAGS}
+
+
+class LazyFrame:
+    """ Values are (start, end) in body until they are read """
+
+    __slots__ = ("body", "values", "padded")
+
+    def __init__(self, body, offsets, padded):
+        self.body = body
+        self.values = offsets
+        self.padded = padded
+
+    def __getitem__(self, tag):
+        value = self.values[tag]
+        if value.__class__ is tuple:
+            value = self.body[value[0]:value[1]].decode("ascii")
+            if self.padded and PADDING_CHAR in value:
+                value = value.replace(PADDING_CHAR, "")
+            self.values[tag] = value
+        return value
+
+
+def scan_v1(msg):
+    offsets = {}
+    i = 0
+    while i < len(msg):
+        tag = TLV_TAG_BYTES[msg[i:i + TLV_TAG_LEN]]
+        value_start = i + TLV_TAG_LEN + TLV_LENGTH_LEN
+        i = value_start + 2 * int(msg[i + TLV_TAG_LEN:value_start], 16)
+        offsets[tag] = (value_start, i)
+    return offsets
+
+
+def scan_v2(msg):
+    offsets = {}
+    i = 0
+    while i < len(msg):
+        code, value_len = V2_TLV_HEADER.unpack_from(msg, i)
+        value_start = i + V2_TLV_HEADER.size
+        i = value_start + value_len
+        offsets[TLV_TAG_NAMES[code]] = (value_start, i)
+    return offsets
+
+
+def lazy_next_frame(decoder):
+    """ FrameDecoder.next_frame without the checks, parsing lazily """
+    if decoder.protocol == PROTOCOL_V1:
+        header_len, msg_len = LENGTH_LEN, int(decoder.buffer[decoder.offset:decoder.offset + LENGTH_LEN])
+    else:
+        header_len, msg_len = V2_LENGTH.size, V2_LENGTH.unpack_from(decoder.buffer, decoder.offset)[0]
+    start = decoder.offset + header_len
+    decoder.offset = start + msg_len
+    with memoryview(decoder.buffer) as view:
+        body = bytes(view[start:decoder.offset])
+    if decoder.protocol == PROTOCOL_V1:
+        return LazyFrame(body, scan_v1(body), True)
+    return LazyFrame(body, scan_v2(body), False)
+
+
+def measure(func, iterations):
+    return min(timeit.repeat(func, number=iterations, repeat=REPEAT)) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+
+    print(f"iterations: {iterations}")
+    print(f"{'message':>12} {'proto':>5} {'eager read':>11} {'lazy read':>10} {'eager unread':>13} {'lazy unread':>12}  [us]")
+    for name, data_dict in MESSAGES.items():
+        tag = next(iter(data_dict))
+        for protocol in (PROTOCOL_V1, PROTOCOL_V2):
+            decoder = FrameDecoder()
+            decoder.protocol = protocol
+            decoder.feed(encode_frame(data_dict, protocol))
+
+            def eager():
+                decoder.offset = 0
+                return decoder.next_frame()
+
+            def lazy():
+                decoder.offset = 0
+                return lazy_next_frame(decoder)
+
+            assert eager()[tag] == lazy()[tag]
+            costs = [measure(eager_or_lazy, iterations) for eager_or_lazy in
+                     (lambda: eager()[tag], lambda: lazy()[tag], eager, lazy)]
+            print(f"{name:>12} {'v' + str(protocol):>5} {costs[0] * 1e6:>11.2f} {costs[1] * 1e6:>10.2f} "
+                  f"{costs[2] * 1e6:>13.2f} {costs[3] * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
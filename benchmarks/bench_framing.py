@@ -0,0 +1,79 @@
+"""
+Bytes on the wire and per-message CPU cost of protocol v1 (ASCII length + hex TLV) and v2 (binary framing).
+
+Encode builds the whole frame from the dictionary, decode parses the frame as FrameDecoder does.
+"turn" is the set of messages the server sends during one turn of a 4 player game (roll result
+to the player, new turn, board state and info to every player).
+
+Usage: python3 benchmarks/bench_framing.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+from common import *
+
+ITERATIONS = 20000
+PLAYERS = 4
+
+MESSAGES = {
+    "NEWTURN": {TLV_NEWTURN_TAG: "Player1"},
+    "ROLLDICE": {TLV_ROLLDICE_TAG: "Player1"},
+    "ROLLDICERESULT": {TLV_OK_TAG: "ok", TLV_ROLLDICERESULT_TAG: "6",
+                       TLV_OPTION_MOVE: ["Player1-0", "Player1-2"], TLV_OPTION_PUT: ["Player1-1", "Player1-3"]},
+    "INFO": {TLV_INFO_TAG: "Player1 moved figure 2 by 6 fields"},
+    "BOARD": {TLV_INFO_TAG: "\n".join("Player{}: 0 12 25 -1".format(i) for i in range(PLAYERS))},
+    "ROOMS": {TLV_INFO_TAG: "number of rooms created: 3\nRoom 1: 2 / 2 clients\nRoom 2: 1 / 2 clients\n" * 2},
+}
+
+# message name: how many times it is sent in one turn
+TURN = {"ROLLDICERESULT": 1, "NEWTURN": PLAYERS, "BOARD": PLAYERS, "INFO": PLAYERS}
+
+
+def decode_frame(frame, protocol):
+    decoder = FrameDecoder()
+    decoder.protocol = protocol
+    decoder.feed(frame)
+    return decoder.next_frame()
+
+
+def measure(func, iterations):
+    return min(timeit.repeat(func, number=iterations, repeat=3)) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    protocols = (PROTOCOL_V1, PROTOCOL_V2)
+
+    print(f"iterations: {iterations}")
+    print(f"{'message':>16} {'v1 [B]':>7} {'v2 [B]':>7} {'saved':>6} "
+          f"{'enc v1 [us]':>12} {'enc v2 [us]':>12} {'dec v1 [us]':>12} {'dec v2 [us]':>12}")
+    sizes = {}
+    for name, data_dict in MESSAGES.items():
+        frames = {p: encode_frame(data_dict, p) for p in protocols}
+        for p in protocols:
+            decoded = decode_frame(frames[p], p)
+            expected = {tag: serialize_list(value) if isinstance(value, list) else value
+                        for tag, value in data_dict.items()}
+            if p == PROTOCOL_V1:    # v1 upper-cases values
+                expected = {tag: value.upper() for tag, value in expected.items()}
+            assert decoded == expected, f"{name} v{p} does not decode to the same message"
+        sizes[name] = {p: len(frames[p]) for p in protocols}
+
+        enc = {p: measure(lambda: encode_frame(data_dict, p), iterations) for p in protocols}
+        dec = {p: measure(lambda: decode_frame(frames[p], p), iterations) for p in protocols}
+        v1, v2 = sizes[name][PROTOCOL_V1], sizes[name][PROTOCOL_V2]
+        print(f"{name:>16} {v1:>7} {v2:>7} {100 * (v1 - v2) / v1:>5.0f}% "
+              f"{enc[PROTOCOL_V1] * 1e6:>12.2f} {enc[PROTOCOL_V2] * 1e6:>12.2f} "
+              f"{dec[PROTOCOL_V1] * 1e6:>12.2f} {dec[PROTOCOL_V2] * 1e6:>12.2f}")
+
+    turn = {p: sum(sizes[name][p] * count for name, count in TURN.items()) for p in protocols}
+    print(f"{'turn':>16} {turn[PROTOCOL_V1]:>7} {turn[PROTOCOL_V2]:>7} "
+          f"{100 * (turn[PROTOCOL_V1] - turn[PROTOCOL_V2]) / turn[PROTOCOL_V1]:>5.0f}%")
+
+
+if __name__ == "__main__":
+    main()
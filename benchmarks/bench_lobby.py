@@ -0,0 +1,104 @@
+"""
+Cost of the answer to one GET_ROOMS request with n rooms open: description built and encoded for
+every request (as before the cache) compared with RoomManager.get_rooms_info, where the cached frame
+only gets the request id appended. "after change" is the cached answer right after a client joined
+a room, the description is built once and shared by the next requests. "page" is one page of
+the structured listing (TLV_LIST_ROOMS_TAG, PAGE rooms with a free seat), its cost does not
+depend on the number of rooms. Protocol v2 frames, server logging disabled.
+
+Usage: python3 benchmarks/bench_lobby.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+import rooms
+from common import *
+from rooms import RoomManager
+from room_listing import RoomListingIndex, OPEN
+from settings import MAX_CLIENTS_PER_ROOM
+from game.logger_conf import server_logger
+
+ITERATIONS = 200
+ROOMS = (10, 100, 1000)      # 1000 rooms is about 25 kB, longer description is cut (v2 value length is u16)
+PAGE = 20
+
+
+class Cli:
+    def __init__(self, name):
+        self.name = name
+        self.rnum = 0
+
+    def set_rnumber(self, rnum):
+        self.rnum = rnum
+
+
+class Conn:
+    def __init__(self, name):
+        self.cli = Cli(name)
+
+
+def rebuild_answer(manager, request_id):
+    """ Answer as the server built it before the cache, see get_rooms_description in git history """
+    msg = "number of rooms created: {}".format(len(manager.rooms))
+    for rnum, room in manager.rooms.items():
+        msg += "\n"
+        msg += str(room)
+        msg += "\n"
+    return build_tlv_with_tags({TLV_INFO_TAG: msg, TLV_REQUEST_ID_TAG: request_id}).get_frame(PROTOCOL_V2)
+
+
+def cached_answer(manager, request_id):
+    return manager.get_rooms_info(PROTOCOL_V2).extend({TLV_REQUEST_ID_TAG: request_id}).get_frame(PROTOCOL_V2)
+
+
+def page_answer(manager, request_id):
+    entries, cursor = manager.list_rooms(PROTOCOL_V2, kind=OPEN, after=1, limit=PAGE)
+    answer = {TLV_LIST_ROOMS_TAG: entries, TLV_REQUEST_ID_TAG: request_id}
+    if cursor is not None:
+        answer[TLV_CURSOR_TAG] = cursor
+    return build_tlv_with_tags(answer).get_frame(PROTOCOL_V2)
+
+
+def open_rooms(manager, nrooms):
+    manager.rooms.clear()
+    manager.room_lines.clear()
+    manager.listing = RoomListingIndex()
+    for rnum in range(1, nrooms + 1):
+        manager.create_room(Conn(f"Player{rnum}"), rnum)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    server_logger.disabled = True
+    rooms.MAX_ROOMS = max(ROOMS) + 1
+    manager = RoomManager()
+    print(f"iterations: {iterations}")
+    print(f"{'rooms':>8} {'frame [B]':>10} {'rebuild [us]':>13} {'cached [us]':>12} {'after change [us]':>18} {'page [us]':>10}")
+    for nrooms in ROOMS:
+        open_rooms(manager, nrooms)
+        assert rebuild_answer(manager, "1") == cached_answer(manager, "1")
+        room = manager.rooms[1]
+        newcomer = Conn("Newcomer")
+
+        def change_and_answer():
+            if len(room) < MAX_CLIENTS_PER_ROOM:
+                room.join(newcomer)
+            else:
+                room.remove(newcomer)
+            manager.room_changed(room)
+            cached_answer(manager, "1")
+
+        rebuild = min(timeit.repeat(lambda: rebuild_answer(manager, "1"), number=iterations, repeat=3))
+        cached = min(timeit.repeat(lambda: cached_answer(manager, "1"), number=iterations, repeat=3))
+        changed = min(timeit.repeat(change_and_answer, number=iterations, repeat=3))
+        paged = min(timeit.repeat(lambda: page_answer(manager, "1"), number=iterations, repeat=3))
+        print(f"{nrooms:>8} {len(cached_answer(manager, '1')):>10} {rebuild / iterations * 1e6:>13.2f} "
+              f"{cached / iterations * 1e6:>12.2f} {changed / iterations * 1e6:>18.2f} {paged / iterations * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
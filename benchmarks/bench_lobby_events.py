@@ -0,0 +1,119 @@
+"""
+Lobby updates for SUBSCRIBERS clients while a burst of JOINS clients join rooms, with ROOMS rooms open:
+polling (every client sends GET_ROOMS once per window and gets the whole description) compared with
+lobby events (RoomManager.send_events, one coalesced message encoded once for all the subscribers).
+Time is the server side cost of one window, bytes are what one client receives in it.
+Protocol v2 frames, server logging disabled.
+
+Usage: python3 benchmarks/bench_lobby_events.py [windows]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+import rooms
+from common import *
+from rooms import RoomManager
+from room_listing import RoomListingIndex
+from lobby_events import LobbyEvents
+from matchmaking import FreeSeatIndex
+from game.logger_conf import server_logger
+
+WINDOWS = 20
+ROOMS = 500         # whole description fits into one v2 value
+SUBSCRIBERS = (10, 100, 1000)
+JOINS = (1, 10, 100)
+
+
+class Cli:
+    def __init__(self, name):
+        self.name = name
+        self.rnum = 0
+
+    def set_rnumber(self, rnum):
+        self.rnum = rnum
+
+
+class Subscriber:
+    """ Lobby connection that only counts what it would send """
+
+    def __init__(self, name):
+        self.cli = Cli(name)
+        self.protocol = PROTOCOL_V2
+        self.request_id = "1"
+        self.bytes_sent = 0
+
+    def send_tlv(self, tlv):
+        self.bytes_sent += len(tlv.get_frame(self.protocol))
+
+    def reply_tlv(self, tlv):
+        self.send_tlv(tlv.extend({TLV_REQUEST_ID_TAG: self.request_id}))
+
+
+class Timers:
+    def schedule(self, delay, callback, *args):
+        return None
+
+
+def reset(manager):
+    manager.rooms.clear()
+    manager.room_lines.clear()
+    manager.free_seats = FreeSeatIndex()
+    manager.listing = RoomListingIndex()
+    manager.events = LobbyEvents()
+    manager.rooms_info = None
+    for rnum in range(1, ROOMS + 1):
+        manager.create_room(Subscriber(f"Owner{rnum}"), rnum)
+
+
+def burst(manager, joins, window):
+    """ Clients join and leave rooms, the same rooms in every window """
+    for i in range(joins):
+        room = manager.rooms[i % ROOMS + 1]
+        conn = Subscriber(f"Joiner{window}-{i}")
+        room.join(conn)
+        manager.room_changed(room)
+        room.remove(conn)
+        manager.room_changed(room)
+
+
+def run(manager, subscribers, joins, windows, events):
+    reset(manager)
+    conns = [Subscriber(f"Sub{i}") for i in range(subscribers)]
+    if events:
+        for conn in conns:
+            manager.subscribe(conn, None)
+    timers = Timers()
+    elapsed = 0
+    for window in range(windows):
+        burst(manager, joins, window)
+        start = timeit.default_timer()
+        if events:
+            manager.send_events(timers)
+        else:
+            for conn in conns:
+                conn.reply_tlv(manager.get_rooms_info(conn.protocol))
+        elapsed += timeit.default_timer() - start
+    return elapsed / windows, conns[0].bytes_sent / windows
+
+
+def main():
+    windows = int(sys.argv[1]) if len(sys.argv) > 1 else WINDOWS
+    server_logger.disabled = True
+    rooms.MAX_ROOMS = ROOMS + 1
+    manager = RoomManager()
+    print(f"windows: {windows}, rooms: {ROOMS}")
+    print(f"{'subscribers':>11} {'joins':>6} {'poll [us]':>10} {'poll [B]':>9} {'events [us]':>12} {'events [B]':>11}")
+    for subscribers in SUBSCRIBERS:
+        for joins in JOINS:
+            poll_time, poll_bytes = run(manager, subscribers, joins, windows, events=False)
+            event_time, event_bytes = run(manager, subscribers, joins, windows, events=True)
+            print(f"{subscribers:>11} {joins:>6} {poll_time * 1e6:>10.1f} {poll_bytes:>9.0f} "
+                  f"{event_time * 1e6:>12.1f} {event_bytes:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
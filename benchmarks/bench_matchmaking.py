@@ -0,0 +1,110 @@
+"""
+Cost of finding a seat for one quick-join with n rooms open: FreeSeatIndex.best compared with the
+trial-and-error a client had to do before (try room numbers one by one until a join succeeds),
+done here on the server side as a scan over RoomManager.rooms. Every room but the last one is full.
+"players/s" is RoomManager.quick_join for a stream of players filling rooms, games are not started
+(Room.game_class is replaced by a class that does nothing) and server logging is disabled.
+
+Usage: python3 benchmarks/bench_matchmaking.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+import rooms
+from matchmaking import FreeSeatIndex
+from rooms import Room, RoomManager
+from settings import MAX_CLIENTS_PER_ROOM
+from game.logger_conf import server_logger
+
+ITERATIONS = 200
+ROOMS = (100, 1000, 10000)
+PLAYERS = 20000
+
+
+class Cli:
+    def __init__(self, name):
+        self.name = name
+        self.rnum = 0
+
+    def set_rnumber(self, rnum):
+        self.rnum = rnum
+
+
+class Conn:
+    timers = None
+
+    def __init__(self, name):
+        self.cli = Cli(name)
+
+    def quick_joined(self, rnum, request_id):
+        pass
+
+
+class IdleGame:
+    def __init__(self, connections, rnum):
+        pass
+
+    def start(self):
+        pass
+
+
+def scan(open_rooms):
+    """ First room that is not full and not playing, in room number order """
+    for room in open_rooms.values():
+        if len(room) < MAX_CLIENTS_PER_ROOM and room.game is None:
+            return room
+    return None
+
+
+def fill_rooms(nrooms):
+    open_rooms = {}
+    index = FreeSeatIndex()
+    for rnum in range(1, nrooms + 1):
+        room = Room(rnum)
+        seats = MAX_CLIENTS_PER_ROOM if rnum < nrooms else MAX_CLIENTS_PER_ROOM - 1
+        for i in range(seats):
+            room.join(Conn(f"Player{rnum}-{i}"))
+        open_rooms[rnum] = room
+        index.update(room)
+    return open_rooms, index
+
+
+def quick_join_rate(nplayers):
+    """ Returns players seated per second by RoomManager.quick_join """
+    manager = RoomManager()
+    manager.rooms.clear()
+    manager.free_seats = FreeSeatIndex()
+    manager.room_lines.clear()
+    manager.next_rnum = None
+    conns = [Conn(f"Quick{i}") for i in range(nplayers)]
+    # rooms are closed by games in the server, here every started room is closed right away
+    start = timeit.default_timer()
+    for conn in conns:
+        manager.quick_join(conn)
+        if conn.cli.rnum in manager.rooms and manager.rooms[conn.cli.rnum].game is not None:
+            manager.close_room(conn.cli.rnum)
+    return nplayers / (timeit.default_timer() - start)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    server_logger.disabled = True
+    rooms.MAX_ROOMS = max(ROOMS) + 1
+    Room.game_class = IdleGame
+    print(f"iterations: {iterations}, seats per room: {MAX_CLIENTS_PER_ROOM}")
+    print(f"{'rooms':>8} {'scan [us]':>10} {'index [us]':>11}")
+    for nrooms in ROOMS:
+        open_rooms, index = fill_rooms(nrooms)
+        assert scan(open_rooms) is index.best() is open_rooms[nrooms]
+        scanned = min(timeit.repeat(lambda: scan(open_rooms), number=iterations, repeat=3))
+        indexed = min(timeit.repeat(index.best, number=iterations, repeat=3))
+        print(f"{nrooms:>8} {scanned / iterations * 1e6:>10.2f} {indexed / iterations * 1e6:>11.2f}")
+    print(f"quick_join: {quick_join_rate(PLAYERS):.0f} players/s ({PLAYERS} players)")
+
+
+if __name__ == "__main__":
+    main()
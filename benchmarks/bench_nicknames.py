@@ -0,0 +1,79 @@
+"""
+Cost of the nickname check of one login with n clients connected: NicknameRegistry.reserve compared
+with the scan it replaced (list of the nicknames of all the connections, then `in`).
+"reconnect storm" is the total for n clients logging in one by one after a restart.
+
+Usage: python3 benchmarks/bench_nicknames.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+from nicknames import NicknameRegistry
+
+ITERATIONS = 200
+CLIENTS = (100, 1000, 10000)
+
+
+class Cli:
+    def __init__(self, name):
+        self.name = name
+
+
+class Conn:
+    def __init__(self, name):
+        self.cli = Cli(name)
+
+
+def scan_login(connection_list, nickname):
+    """ Check done by the server before the registry, see get_all_nicknames in git history """
+    nicknames = [conn.cli.name for conn in connection_list.values() if isinstance(conn, Conn)]
+    return nickname not in nicknames
+
+
+def storm(nclients, login):
+    for i in range(nclients):
+        login(i)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    print(f"iterations: {iterations}")
+    print(f"{'clients':>8} {'scan [us]':>10} {'registry [us]':>14} {'storm scan [ms]':>16} {'storm registry [ms]':>20}")
+    for nclients in CLIENTS:
+        connection_list = {i: Conn(f"Player{i}") for i in range(nclients)}
+        registry = NicknameRegistry()
+        for conn in connection_list.values():
+            registry.reserve(conn.cli.name, conn)
+        newcomer = Conn("Newcomer")
+
+        def registry_login():
+            registry.reserve(newcomer.cli.name, newcomer)
+            registry.release(newcomer.cli.name, newcomer)
+
+        scan = min(timeit.repeat(lambda: scan_login(connection_list, "Newcomer"), number=iterations, repeat=3))
+        reserve = min(timeit.repeat(registry_login, number=iterations, repeat=3))
+
+        storm_list = {}
+        storm_registry = NicknameRegistry()
+
+        def scan_storm_login(i):
+            conn = Conn(f"Player{i}")
+            if scan_login(storm_list, conn.cli.name):
+                storm_list[i] = conn
+
+        def registry_storm_login(i):
+            conn = Conn(f"Player{i}")
+            storm_registry.reserve(conn.cli.name, conn)
+
+        storm_scan = timeit.timeit(lambda: storm(nclients, scan_storm_login), number=1)
+        storm_reserve = timeit.timeit(lambda: storm(nclients, registry_storm_login), number=1)
+        print(f"{nclients:>8} {scan / iterations * 1e6:>10.2f} {reserve / iterations * 1e6:>14.2f} "
+              f"{storm_scan * 1e3:>16.1f} {storm_reserve * 1e3:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
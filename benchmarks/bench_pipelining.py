@@ -0,0 +1,87 @@
+"""
+Lobby requests answered per second when a client waits for every answer and when it pipelines
+them with request ids (ClientDGA.send_requests).
+
+Server runs in a subprocess (selector loop). One ClientDGA sets its nickname and sends ROUNDS
+rounds of GET_ROOMS, GET_USERINFO and ROOM (joins the same room again, the server answers FAIL).
+Sequential waits for each answer before the next request, pipelined sends the whole round and
+then waits. On loopback the round trip is short, DELAYS adds latency on the client side
+(sleep before the answers are read) to show what one round trip per request costs on a real network.
+
+Usage: python3 benchmarks/bench_pipelining.py [rounds]
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # loggers open log_files/
+
+from common import *
+from client import ClientDGA
+
+ROUNDS = 200
+PORT = 47821
+DELAYS = (0, 0.001)     # seconds added to every round trip
+REQUESTS = ({TLV_GET_ROOMS: "-"}, {TLV_GET_USERINFO: "-"}, {TLV_ROOM_TAG: "1"})
+
+SERVER = "import server, sys; server.DontGetAngryServer('127.0.0.1', int(sys.argv[1]))"
+
+
+def connect(name):
+    cli = ClientDGA()
+    cli.init()
+    cli.connect("127.0.0.1", PORT)
+    threading.Thread(target=cli.read_loop, args=(threading.Event(),), daemon=True).start()
+    answer = cli.wait_for_reply(cli.send_request({TLV_NICKNAME_TAG: name, TLV_PROTOCOL_TAG: "2"}))
+    assert TLV_OK_TAG in answer, answer
+    cli.wait_for_reply(cli.send_request({TLV_ROOM_TAG: "1"}))
+    return cli
+
+
+def sequential(cli, rounds, delay):
+    for _ in range(rounds):
+        for data_dict in REQUESTS:
+            request_id = cli.send_request(dict(data_dict))
+            time.sleep(delay)
+            cli.wait_for_reply(request_id)
+
+
+def pipelined(cli, rounds, delay):
+    for _ in range(rounds):
+        request_ids = [cli.send_request(dict(data_dict)) for data_dict in REQUESTS]
+        time.sleep(delay)
+        for request_id in request_ids:
+            cli.wait_for_reply(request_id)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else ROUNDS
+    env = dict(os.environ, DGA_LOBBY_IDLE_TIMEOUT="0")
+    server = subprocess.Popen([sys.executable, "-c", SERVER, str(PORT)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    try:
+        cli = connect("bench")
+        print(f"rounds: {rounds}, requests per round: {len(REQUESTS)}")
+        print(f"{'delay [ms]':>10} {'mode':>10} {'requests/s':>11} {'us/request':>11}")
+        for delay in DELAYS:
+            for mode in (sequential, pipelined):
+                start = time.perf_counter()
+                mode(cli, rounds, delay)
+                elapsed = time.perf_counter() - start
+                requests = rounds * len(REQUESTS)
+                print(f"{delay * 1000:>10.1f} {mode.__name__:>10} {requests / elapsed:>11.0f} "
+                      f"{elapsed / requests * 1e6:>11.1f}")
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)    # read loop of the client interrupts main thread on EOF
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
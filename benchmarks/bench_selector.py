@@ -0,0 +1,87 @@
+"""
+Wakeup cost of the server loop with many idle connections.
+
+Compares the old loop (select.select over a list rebuilt from connection_list on every
+iteration) with the selectors loop used by DontGetAngryServer.run (sockets registered once).
+Every iteration one byte is written to a single active socket, the loop wakes up and reads it.
+
+Idle connections are unconnected UDP sockets: one descriptor each and never readable,
+which is exactly what an idle TCP client looks like to the poller.
+
+Usage: python3 benchmarks/bench_selector.py [iterations]
+"""
+import resource
+import select
+import selectors
+import socket
+import sys
+import time
+
+SIZES = [100, 1000, 10000]
+ITERATIONS = 2000
+
+
+def raise_fd_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+def bench_select(connection_list, active_r, active_w, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        active_w.send(b"x")
+        read_sockets, _, _ = select.select(list(connection_list.keys()), [], [])
+        for sock in read_sockets:
+            sock.recv(1)
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_selectors(connection_list, active_r, active_w, iterations):
+    sel = selectors.DefaultSelector()
+    for sock, conn in connection_list.items():
+        sel.register(sock, selectors.EVENT_READ, conn)
+    try:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            active_w.send(b"x")
+            for key, _ in sel.select():
+                key.fileobj.recv(1)
+        return (time.perf_counter() - start) / iterations
+    finally:
+        sel.close()
+
+
+def run(size, iterations):
+    active_r, active_w = socket.socketpair()
+    idle = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(size - 1)]
+    connection_list = {sock: None for sock in idle}
+    connection_list[active_r] = None
+    try:
+        try:
+            select_cost = bench_select(connection_list, active_r, active_w, iterations)
+        except ValueError:      # filedescriptor out of range in select()
+            select_cost = None
+        selectors_cost = bench_selectors(connection_list, active_r, active_w, iterations)
+    finally:
+        for sock in idle:
+            sock.close()
+        active_r.close()
+        active_w.close()
+    return select_cost, selectors_cost
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    raise_fd_limit(max(SIZES) + 64)
+
+    print(f"selector: {selectors.DefaultSelector.__name__}, iterations: {iterations}")
+    print(f"{'connections':>12} {'select.select [us]':>20} {'selectors [us]':>16}")
+    for size in SIZES:
+        select_cost, selectors_cost = run(size, iterations)
+        select_descr = f"{select_cost * 1e6:.1f}" if select_cost is not None else "n/a (FD_SETSIZE)"
+        print(f"{size:>12} {select_descr:>20} {selectors_cost * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Per-message CPU cost of the TLV codec in common.py compared with the pytlv path it replaced.
+
+The pytlv path is reproduced here as it was in common.py: new pytlv.TLV object per message,
+values padded before build, length header from create_msg, str.replace of the padding on every
+parsed value. Both paths produce the same bytes, which is checked before measuring.
+Network logging is not included in any of the paths.
+
+Usage: python3 benchmarks/bench_tlv.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # loggers open log_files/
+
+from common import *
+
+try:
+    from pytlv.TLV import TLV
+except ImportError:
+    TLV = None
+
+ITERATIONS = 20000
+
+MESSAGES = {
+    "NEWTURN": {TLV_NEWTURN_TAG: "PLAYER1"},
+    "ROLLDICERESULT": {TLV_OK_TAG: "ok", TLV_ROLLDICERESULT_TAG: "6",
+                       TLV_OPTION_MOVE: ["PLAYER1-0", "PLAYER1-2"], TLV_OPTION_PUT: ["PLAYER1-1", "PLAYER1-3"]},
+    "INFO": {TLV_INFO_TAG: "number of rooms created: 3\nRoom 1: 2 / 2 clients\nRoom 2: 1 / 2 clients\n" * 2},
+}
+
+
+def pytlv_encode(data_dict):
+    tlv = TLV(TLV_TAGS)
+    parsed_dict = {}
+    for tag, value in data_dict.items():
+        if isinstance(value, list):
+            value = serialize_list(value)
+        parsed_dict[tag] = add_tlv_padding(value)
+    tlv.build(parsed_dict)
+    msg = tlv.tlv_string
+    return (f"{len(msg) :< {LENGTH_LEN}}" + msg).encode("utf-8")
+
+
+def pytlv_decode(frame):
+    msg = frame[LENGTH_LEN:].decode("utf-8")
+    parsed_msg = TLV(TLV_TAGS).parse(msg)
+    for key, value in parsed_msg.items():
+        parsed_msg[key] = remove_tlv_padding(value)
+    return parsed_msg
+
+
+def codec_encode(data_dict):
+    return build_tlv_with_tags(data_dict).get_frame()
+
+
+def codec_decode(frame):
+    return decode_tlv(frame[LENGTH_LEN:].decode("utf-8"))
+
+
+def measure(func, arg, iterations):
+    return min(timeit.repeat(lambda: func(arg), number=iterations, repeat=3)) / iterations
+
+
+def main():
+    if TLV is None:
+        print("pytlv is not installed, nothing to compare with (pip install pytlv)")
+        return
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+
+    print(f"iterations: {iterations}")
+    print(f"{'message':>16} {'op':>7} {'pytlv [us]':>11} {'codec [us]':>11} {'speedup':>8}")
+    for name, data_dict in MESSAGES.items():
+        frame = pytlv_encode(data_dict)
+        assert codec_encode(data_dict) == frame, "codec is not wire compatible"
+        assert codec_decode(frame) == dict(pytlv_decode(frame))
+
+        for op, old, new, arg in (("encode", pytlv_encode, codec_encode, data_dict),
+                                  ("decode", pytlv_decode, codec_decode, frame)):
+            old_cost = measure(old, arg, iterations)
+            new_cost = measure(new, arg, iterations)
+            print(f"{name:>16} {op:>7} {old_cost * 1e6:>11.2f} {new_cost * 1e6:>11.2f} {old_cost / new_cost:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Send syscalls of the server and TCP data segments received by the clients per turn of a game,
+with WRITE_COALESCING off and on.
+
+Server runs in a subprocess (selector loop, games in the lobby loop), its socket send calls are
+counted. Scripted players play GAMES games of 2 players at the same time and always take the first
+option. Segments are tcpi_data_segs_in of the client sockets (Linux). Per turn numbers include
+the nickname and room handshake, that is 2 messages per player.
+
+Usage: python3 benchmarks/bench_turn_writes.py [games]
+"""
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # loggers open log_files/
+
+from common import *
+
+GAMES = 4
+PORT = 47811
+TCPI_DATA_SEGS_IN = 152     # offset in struct tcp_info
+
+SERVER = """
+import socket, sys, json
+calls = {"send": 0, "sendmsg": 0}
+def counted(name):
+    method = getattr(socket.socket, name)
+    def wrapper(self, *args):
+        calls[name] += 1
+        return method(self, *args)
+    return wrapper
+for name in calls:
+    setattr(socket.socket, name, counted(name))
+import server
+try:
+    server.DontGetAngryServer("127.0.0.1", int(sys.argv[1]), game_workers=0)
+finally:
+    print(json.dumps(calls), flush=True)
+"""
+
+
+def data_segments_in(sock):
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 256)
+        return struct.unpack_from("I", info, TCPI_DATA_SEGS_IN)[0]
+    except (OSError, AttributeError, struct.error):
+        return 0
+
+
+def player(name, room, start, results):
+    sock = socket.create_connection(("127.0.0.1", PORT))
+    sock.settimeout(60)
+    sendTlv(sock, add_tlv_tag(TLV_NICKNAME_TAG, name))
+    recvTlv(sock)
+    sendTlv(sock, add_tlv_tag(TLV_ROOM_TAG, str(room)))
+    recvTlv(sock)
+    if start:
+        time.sleep(0.3)     # second player joins
+        sendTlv(sock, add_tlv_tag(TLV_START_MSG, "-"))
+
+    turns = 0
+    try:
+        while True:
+            msg = recvTlv(sock)
+            if TLV_NEWTURN_TAG in msg:
+                turns += 1
+                if msg[TLV_NEWTURN_TAG] == name.upper():
+                    sendTlv(sock, add_tlv_tag(TLV_ROLLDICE_TAG, name))
+            if TLV_ROLLDICERESULT_TAG in msg and TLV_OPTION_SKIP not in msg:
+                if TLV_OPTION_PUT in msg:
+                    sendTlv(sock, add_tlv_tag(TLV_PLACEFIGURE_TAG, "0"))
+                else:
+                    sendTlv(sock, add_tlv_tag(TLV_MOVEFIGURE_TAG, deserialize_list(msg[TLV_OPTION_MOVE])[0]))
+            if TLV_INFO_TAG in msg and "GAME ENDED" in msg[TLV_INFO_TAG]:
+                break
+    except (EOFError, OSError):
+        pass
+    results[name] = (turns, data_segments_in(sock))
+    sock.close()
+
+
+def run(coalescing, games):
+    env = dict(os.environ, DGA_WRITE_COALESCING=str(int(coalescing)), DGA_LOBBY_IDLE_TIMEOUT="0")
+    server = subprocess.Popen([sys.executable, "-c", SERVER, str(PORT)], env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    time.sleep(1)
+    results = {}
+    threads = []
+    for game in range(games):
+        for i, name in enumerate(("A{}".format(game), "B{}".format(game))):
+            threads.append(threading.Thread(target=player, args=(name, game + 1, i == 1, results)))
+            threads[-1].start()
+            time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    server.send_signal(subprocess.signal.SIGINT)
+    calls = json.loads(server.communicate(timeout=10)[0].strip().splitlines()[-1])
+
+    turns = sum(results["A{}".format(game)][0] for game in range(games))
+    segments = sum(segs for _, segs in results.values())
+    return turns, calls["send"] + calls["sendmsg"], segments
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else GAMES
+    print(f"games: {games}")
+    print(f"{'coalescing':>10} {'turns':>6} {'syscalls':>9} {'segments':>9} {'syscalls/turn':>14} {'segments/turn':>14}")
+    for coalescing in (False, True):
+        turns, syscalls, segments = run(coalescing, games)
+        print(f"{'on' if coalescing else 'off':>10} {turns:>6} {syscalls:>9} {segments:>9} "
+              f"{syscalls / turns:>14.2f} {segments / turns:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
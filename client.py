@@ -6,8 +6,13 @@ import select
 import threading
 import queue
 import os
-from settings import CONNECT_TIMEOUT
+from itertools import count
+from settings import CONNECT_TIMEOUT, PROTOCOL_VERSION, ROOM_LIST_PAGE_MAX
 from game.logger_conf import client_logger
+import tracing
+from game.board_state import BoardState
+from room_listing import parse_entry
+from lobby_events import LobbyState
 
 
 # check if it matches print_options
@@ -52,6 +57,14 @@ class ClientDGA:
         self.player_options = {}        # tlv message that indicates player possible options
         self.option_chosen = None       # tlv tag that indicates player's choice
         self.skip_turn = False
+        self.protocol = PROTOCOL_V1     # framing version, negotiated with nickname
+        self.board = BoardState()       # board sent to protocol v2 clients as snapshot and deltas
+        self.lobby = LobbyState()       # rooms, kept up to date by lobby events if subscribed
+        self.lobby_subscribed = False
+        self.decompressor = None        # FrameDecompressor if server compresses its messages
+        self.request_ids = count(1)     # ids of the requests sent with send_request
+        self.replies = {}               # request id: answer not taken by wait_for_reply yet
+        self.replies_ready = threading.Condition()
 
     def init(self):
         try:
@@ -175,7 +188,21 @@ class ClientDGA:
 
         while True:
             try:
-                server_ans = recvTlv(self.sock)
+                server_ans = recvTlv(self.sock, self.protocol, self.decompressor)
+                if TLV_OK_TAG in server_ans and TLV_PROTOCOL_TAG in server_ans:
+                    # server accepted the framing version, next messages use it
+                    self.protocol = int(server_ans[TLV_PROTOCOL_TAG])
+                    if server_ans.get(TLV_COMPRESSION_TAG) == COMPRESSION_ZLIB:
+                        self.decompressor = FrameDecompressor()
+
+                if self.lobby_subscribed and TLV_LIST_ROOMS_TAG in server_ans:    # in order with lobby events
+                    self.lobby.load(deserialize_list(server_ans[TLV_LIST_ROOMS_TAG])[1:])
+
+                if TLV_REQUEST_ID_TAG in server_ans:    # answer to send_request, in any order
+                    with self.replies_ready:
+                        self.replies[server_ans[TLV_REQUEST_ID_TAG]] = server_ans
+                        self.replies_ready.notify_all()
+                    continue
 
                 if TLV_OK_TAG in server_ans or TLV_FAIL_TAG in server_ans:    # ACK / NACK response - main thread is awaiting for it
                     # print("Message {} has ACK/NACK tag => saving to pipeline for future processing".format(server_ans))
@@ -197,6 +224,7 @@ class ClientDGA:
                 return
             except Exception as e:
                 client_logger.error("Other error while reading data: " + str(e))
+                tracing.dump_error(None, e)
                 os.kill(os.getpid(), signal.SIGINT)
                 event.set()  # alarm main thread that program should exit
                 return
@@ -217,7 +245,16 @@ class ClientDGA:
             self.game_started = False
 
         if TLV_INFO_TAG in ans:     # information message -> print it
-            print("\n" + remove_tlv_padding(ans[TLV_INFO_TAG]))
+            print("\n" + ans[TLV_INFO_TAG])
+
+        if TLV_BOARD_TAG in ans:
+            self.board.apply(deserialize_list(ans[TLV_BOARD_TAG]), snapshot=True)
+
+        if TLV_BOARD_DELTA_TAG in ans:
+            self.board.apply(deserialize_list(ans[TLV_BOARD_DELTA_TAG]))
+
+        if TLV_LOBBY_EVENTS_TAG in ans:
+            self.lobby.apply(deserialize_list(ans[TLV_LOBBY_EVENTS_TAG]))
 
         if TLV_MOVEORPLACE_TAG in ans:
             client_logger.debug("TLV_MOVEORPLACE_TAG received")
@@ -287,14 +324,14 @@ class ClientDGA:
 
         client_logger.debug("Place or Move command options chosen {}".format(data_dict))
         tlv = build_tlv_with_tags(data_dict)
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
     
     def send_roll_command(self):
         """Send roll dice command to the server and anticipate positive response with roll result"""
         while True:
             client_logger.debug("Sending roll command")
             tlv = add_tlv_tag(TLV_ROLLDICE_TAG, self.nickname)
-            sendTlv(self.sock, tlv)
+            self.send_tlv(tlv)
 
             if self.wait_for_ack() and TLV_ROLLDICERESULT_TAG in self.current_msg:
                 client_logger.debug("ROLLDICE result: " + str(self.current_msg))
@@ -317,31 +354,66 @@ class ClientDGA:
             if not nickname:
                 continue
 
-            tlv = add_tlv_tag(TLV_NICKNAME_TAG, nickname)
-            sendTlv(self.sock, tlv)
+            request_id = self.send_request({TLV_NICKNAME_TAG: nickname, TLV_PROTOCOL_TAG: str(PROTOCOL_VERSION),
+                                            TLV_COMPRESSION_TAG: COMPRESSION_ZLIB})
 
-            if self.wait_for_ack():
+            if self.wait_for_ack(request_id):
                 self.nickname = nickname
                 print(self.current_msg[TLV_OK_TAG])
                 return
             else:
                 print(self.current_msg[TLV_FAIL_TAG])       # print error message
 
+    def send_tlv(self, tlv):
+        sendTlv(self.sock, tlv, self.protocol)
+
+    def send_request(self, data_dict):
+        """
+        Send request with a new request id, the server echoes it in the answer. Does not wait for the answer,
+        several requests can be sent before the answers are read with wait_for_reply (pipelining).
+        @param data_dict:   (dict)  : tag: value of the request
+        @return:            (str)   : request id
+        """
+        request_id = str(next(self.request_ids))
+        data_dict[TLV_REQUEST_ID_TAG] = request_id
+        self.send_tlv(build_tlv_with_tags(data_dict))
+        return request_id
+
+    def wait_for_reply(self, request_id):
+        """ Blocks until answer to the request arrives. Returns the answer (dict) """
+        with self.replies_ready:
+            self.replies_ready.wait_for(lambda: request_id in self.replies)
+            return self.replies.pop(request_id)
+
+    def send_requests(self, requests):
+        """
+        Send all requests at once and wait for the answers, one round trip instead of one per request.
+        Nickname must be answered first, framing of the next requests is negotiated with it.
+        @param requests:    (list)  : data_dict of every request, e.g. {TLV_GET_ROOMS: "-"}
+        @return:            (list)  : answers in order of the requests
+        """
+        request_ids = [self.send_request(data_dict) for data_dict in requests]
+        return [self.wait_for_reply(request_id) for request_id in request_ids]
+
     def set_room(self):
         """
         Set room number in a loop. If non-int is passed from stdin or server send negative response then try again.
         If server sends back positive response then break and return None.
         """
         while True:
-            room = input("Create or select existing channel\n> ")
+            room = input("Create or select existing channel, q joins any room with a free seat\n> ")
             try:
-                int(room)
-                tlv = add_tlv_tag(TLV_ROOM_TAG, room)
-                sendTlv(self.sock, tlv)
+                if room.strip().lower() in ("q", "quick"):
+                    request = {TLV_QUICKJOIN_TAG: "-"}
+                    print("Waiting for a free seat...")
+                else:
+                    int(room)
+                    request = {TLV_ROOM_TAG: room}
+                request_id = self.send_request(request)
 
-                if self.wait_for_ack():     # positive answer
+                if self.wait_for_ack(request_id):     # positive answer
                     print("Server answer: ", self.current_msg[TLV_OK_TAG])  # new msg is saved after wait_for_ack call
-                    client_logger.debug("Joined room number {}".format(room))
+                    client_logger.debug("Joined room number {}".format(self.current_msg.get(TLV_ROOM_TAG, room)))
                     return
 
                 print("Server answer: ", self.current_msg[TLV_FAIL_TAG])      # fail msg info
@@ -360,14 +432,20 @@ class ClientDGA:
             self.print_options()
         elif msg.upper().strip() in ["5", "EXIT"]:
             self.close()
+        elif msg.upper().strip() in ["6", "LIST_ROOMS"]:
+            self.print_open_rooms()
 
-    def wait_for_ack(self):
+    def wait_for_ack(self, request_id=None):
         """
         Blocks until new msg is put into the Queue. Returns True if msg contains OK_TAG. Otherwise, if msg contains
         FAIL_TAG or any doesn't contain any control tag (OK/FAIL) it returns False.
-        @return:    (bool)  : indicates status of the control msg
+        @param request_id:  (str)   : wait for the answer to the request sent by send_request instead
+        @return:            (bool)  : indicates status of the control msg
         """
-        msg = self.pipeline.get()       # blocks here
+        if request_id is not None:
+            msg = self.wait_for_reply(request_id)
+        else:
+            msg = self.pipeline.get()       # blocks here
         self.current_msg = msg          # msg can be read from outside of this method while it returns control information
 
         if TLV_OK_TAG in msg:
@@ -394,6 +472,8 @@ class ClientDGA:
             rcvd_nickname = msg[TLV_NEWTURN_TAG]
             if self.nickname.upper() == rcvd_nickname.upper():
                 self.game_client_turn = True
+                if self.protocol >= PROTOCOL_V2:    # server does not send the text board
+                    print(self.board.get_player_status(rcvd_nickname))
                 flush_input()
                 return True
             else:
@@ -408,6 +488,7 @@ class ClientDGA:
         3. START : start a game, available only if you joined a room with at least other player
         4. HELP : print options
         5. EXIT : shutdown program
+        6. LIST_ROOMS : list rooms with a free seat
         """
         print(interface_msg)
 
@@ -475,11 +556,57 @@ class ClientDGA:
     def get_server_rooms(self):
         """Server should response with rooms stats e.g. room 2: 1/4 players status: WAITING FOR PLAYERS"""
         tlv = add_tlv_tag(TLV_GET_ROOMS, "-")
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
+
+    def list_rooms(self, options=(), after=None):
+        """
+        Request one page of the room listing and wait for it.
+        @param options: (list)  : options of the listing, e.g. ["open", "limit=10"], see room_listing.py
+        @param after:   (str)   : cursor returned with the previous page
+        @return:        (int, list, str)    : number of rooms on the server, (rnum, members, seats, state)
+                                              of the rooms in the page, cursor of the next page or None
+        """
+        options = list(options) + (["after=" + after] if after is not None else [])
+        answer = self.wait_for_reply(self.send_request({TLV_LIST_ROOMS_TAG: options or ["-"]}))
+        if TLV_FAIL_TAG in answer:
+            raise ValueError(answer[TLV_FAIL_TAG])
+        entries = deserialize_list(answer[TLV_LIST_ROOMS_TAG])
+        return int(entries[0]), [parse_entry(entry) for entry in entries[1:]], answer.get(TLV_CURSOR_TAG)
+
+    def subscribe_lobby(self):
+        """
+        Let the server push changes of the rooms, self.lobby is updated by them. Rooms that exist already
+        are listed after subscribing, so no change is missed in between. Read loop applies pages of the
+        listing to self.lobby while subscribed, in the order they come with the events.
+        """
+        self.lobby_subscribed = True
+        self.wait_for_reply(self.send_request({TLV_SUBSCRIBE_TAG: "1"}))
+        cursor = None
+        while True:
+            cursor = self.list_rooms(["limit={}".format(ROOM_LIST_PAGE_MAX)], cursor)[2]
+            if cursor is None:
+                return
+
+    def unsubscribe_lobby(self):
+        self.wait_for_reply(self.send_request({TLV_SUBSCRIBE_TAG: "0"}))
+        self.lobby_subscribed = False
+
+    def print_open_rooms(self):
+        """ Print rooms with a free seat, page by page """
+        cursor = None
+        while True:
+            total, rooms, cursor = self.list_rooms(["open"], cursor)
+            for rnum, members, seats, state in rooms:
+                print("Room {}: {} / {} clients".format(rnum, members, seats))
+            if cursor is None:
+                print("{} room(s) on the server".format(total))
+                return
+            if input("Enter for more, q to stop\n> ").strip().lower() == "q":
+                return
 
     def get_user_info(self):
         tlv = add_tlv_tag(TLV_GET_USERINFO, "-")
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
 
     def get_server_my_room(self):
         """Server should response with client's room stats"""
@@ -490,7 +617,7 @@ class ClientDGA:
 
     def send_start_msg(self):
         tlv = add_tlv_tag(TLV_START_MSG, "-")
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
 
     def reset_vars(self):
         """ For the debug purpose reset all variables to init values """
@@ -1,11 +1,16 @@
-from settings import LENGTH_LEN, PADDING_CHAR, LIST_DELIMITER
-from game.logger_conf import network_logger
-from pytlv.TLV import *
+from settings import LENGTH_LEN, PADDING_CHAR, LIST_DELIMITER, RCV_BUFFSIZE, MAX_MSG_LEN, COMPRESSION_LEVEL
+from exceptions import ClearClientException
+import tracing
 import socket
+import struct
+import zlib
 
 # TLV
 TLV_NICKNAME_TAG = '0001'
 TLV_ROOM_TAG = '0002'
+TLV_PROTOCOL_TAG = '0003'   # framing version, sent with nickname
+TLV_COMPRESSION_TAG = '0004'    # compression of server messages, sent with nickname
+TLV_REQUEST_ID_TAG = '0005'     # chosen by the client, echoed in the reply to the request
 
 # notifications
 TLV_OK_TAG = '1111'
@@ -15,6 +20,11 @@ TLV_ROLLDICERESULT_TAG = '1113'
 TLV_INFO_TAG = '0100'   # msg to print
 TLV_GET_ROOMS = '3000'
 TLV_GET_USERINFO = '3001'
+TLV_QUICKJOIN_TAG = '3002'     # join any room with a free seat, answered with the room number
+TLV_LIST_ROOMS_TAG = '3003'    # one page of the room listing, see room_listing.py
+TLV_CURSOR_TAG = '3004'        # sent with a page of the listing if there are more rooms
+TLV_SUBSCRIBE_TAG = '3005'     # "1" subscribes to lobby events, "0" unsubscribes, see lobby_events.py
+TLV_LOBBY_EVENTS_TAG = '3006'  # rooms changed in the last window, pushed to subscribers
 
 TLV_START_MSG = '5000'
 TLV_STARTED_TAG = '5001'
@@ -24,14 +34,53 @@ TLV_ROLLDICE_TAG = '5010'
 TLV_MOVEORPLACE_TAG = '5012'
 TLV_PLACEFIGURE_TAG = '5013'
 TLV_MOVEFIGURE_TAG = '5014'
+TLV_BOARD_TAG = '5020'          # board snapshot, see game/board_state.py
+TLV_BOARD_DELTA_TAG = '5021'    # board changes made by the last turn
 
 TLV_OPTION_PUT = "6000"
 TLV_OPTION_MOVE = "6001"
 TLV_OPTION_SKIP = "6002"
 
-TLV_TAGS = [TLV_NICKNAME_TAG, TLV_ROOM_TAG, TLV_ROLLDICE_TAG, TLV_NEWTURN_TAG, TLV_PLACEFIGURE_TAG, TLV_MOVEFIGURE_TAG, TLV_INFO_TAG, TLV_OK_TAG, TLV_FAIL_TAG,
-            TLV_ROLLDICERESULT_TAG, TLV_GET_ROOMS, TLV_START_MSG, TLV_STARTED_TAG, TLV_FINISHED_TAG, TLV_MOVEORPLACE_TAG, TLV_GET_USERINFO,
-            TLV_OPTION_PUT, TLV_OPTION_MOVE, TLV_OPTION_SKIP]
+TLV_TAGS = [TLV_NICKNAME_TAG, TLV_ROOM_TAG, TLV_PROTOCOL_TAG, TLV_COMPRESSION_TAG, TLV_REQUEST_ID_TAG, TLV_ROLLDICE_TAG, TLV_NEWTURN_TAG, TLV_PLACEFIGURE_TAG, TLV_MOVEFIGURE_TAG, TLV_INFO_TAG, TLV_OK_TAG, TLV_FAIL_TAG,
+            TLV_ROLLDICERESULT_TAG, TLV_GET_ROOMS, TLV_START_MSG, TLV_STARTED_TAG, TLV_FINISHED_TAG, TLV_MOVEORPLACE_TAG, TLV_GET_USERINFO, TLV_QUICKJOIN_TAG,
+            TLV_LIST_ROOMS_TAG, TLV_CURSOR_TAG, TLV_SUBSCRIBE_TAG, TLV_LOBBY_EVENTS_TAG,
+            TLV_OPTION_PUT, TLV_OPTION_MOVE, TLV_OPTION_SKIP, TLV_BOARD_TAG, TLV_BOARD_DELTA_TAG]
+
+# Wire format of the TLV message (compatible with pytlv.TLV used before):
+# tag (4 chars) + value length in pairs of chars (2 hex digits) + value padded with PADDING_CHAR to even length.
+# Values are upper case, message ends at the first empty value.
+TLV_TAG_LEN = 4
+TLV_LENGTH_LEN = 2
+TLV_TAG_SET = frozenset(TLV_TAGS)
+TLV_LENGTHS = ["{:02X}".format(n) for n in range(256)]      # pairs of chars -> length field
+V1_MAX_VALUE_LEN = 2 * (len(TLV_LENGTHS) - 1)     # chars, longer values cannot be parsed by the receiver
+
+# Framing versions
+# v1: length of the message as 10 ASCII chars (LENGTH_LEN) + TLV string described above
+# v2: length as 4 bytes + binary TLV: tag as u16 (e.g. '5003' -> 0x5003), value length as u16, raw UTF-8 value
+# Every client starts with v1, v2 is used after the server confirms it in the answer to the nickname.
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+V2_LENGTH = struct.Struct(">I")
+V2_TLV_HEADER = struct.Struct(">HH")
+V2_MAX_VALUE_LEN = 0xFFFF       # bytes, value length is u16
+TLV_TAG_CODES = {tag: int(tag, 16) for tag in TLV_TAGS}
+TLV_TAG_NAMES = {code: tag for tag, code in TLV_TAG_CODES.items()}
+
+# Compression (protocol v2 only, server -> client)
+# Frames of one connection are one zlib stream with a preset dictionary, flushed after every frame.
+# Compressed frame has V2_COMPRESSED bit set in the length header, V2_STREAM_START marks the first
+# frame of a new stream (e.g. connection has been passed to another server process).
+COMPRESSION_ZLIB = "ZLIB"      # upper case, nickname handshake uses v1 framing
+V2_COMPRESSED = 0x80000000
+V2_STREAM_START = 0x40000000
+V2_LENGTH_MASK = 0x3FFFFFFF
+COMPRESSION_DICT = (
+    b"Player  starting position: \n"
+    b"Figures have not placed yet: Figures finished: Board: \n|00|01|02|03|04|05|06|07|08|09|10|11|12|"
+    b"\n****Welcome, you have connected to the server****\n"
+    b"number of rooms created: \nRoom 1: 0 / 4 clients\nRoom 2: 1 / 4 clients\nRoom 3: 2 / 4 clients\n"
+)
 
 # TLV END
 
@@ -41,11 +90,14 @@ def create_msg(msg):
     header = f"{data_len :< {header_len}}"
     # msg_enc = msg.encode("utf-8")
     created_msg = header + msg
-    network_logger.debug("created message: " + created_msg)
     return created_msg
 
 def sendText(sock, msg):
-    msg = msg.encode("utf-8")
+    sendBytes(sock, msg.encode("utf-8"))
+
+
+def sendBytes(sock, msg):
+    """Write whole binary message to the socket"""
     msg_len = len(msg)
     totalsent = 0
     while totalsent < msg_len:
@@ -56,30 +108,348 @@ def sendText(sock, msg):
 
 
 def recvall(sock, n):
-    """Read n bytes from socket. Returns binary message. Raise EOFError if socket has been closed"""
-    msg = b''
-    while len(msg) < n:
-        try:
-            chunk = sock.recv(n - len(msg))
-        except BlockingIOError:
-            network_logger.error("BlockingIO Exception")
-            return b""
-        if not chunk:
+    """Read n bytes from blocking socket. Returns binary message. Raise EOFError if socket has been closed"""
+    msg = bytearray(n)
+    view = memoryview(msg)
+    received = 0
+    while received < n:
+        nbytes = sock.recv_into(view[received:], n - received)
+        if not nbytes:
             raise EOFError("socket closed while reading data")
-        msg += chunk
+        received += nbytes
 
-    return msg
+    return bytes(msg)
 
 def recvText(sock):
-    msg_len = (recvall(sock, LENGTH_LEN).decode("utf-8"))
-    network_logger.debug("msg len: " + msg_len)
-    msg_len = int(msg_len)
+    msg_len = int(recvall(sock, LENGTH_LEN).decode("utf-8"))
     return recvall(sock, msg_len).decode("utf-8")
 
 
+class FrameDecoder:
+    """
+    Incremental decoder of length prefixed TLV messages received by one connection.
+    Takes whatever bytes the socket has, returns complete messages and keeps partial one
+    until the rest of it arrives, so a slow or fragmented client never blocks the reader.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()       # received bytes, messages not handled yet
+        self.offset = 0                 # start of the first not decoded message in buffer
+        self.protocol = PROTOCOL_V1     # framing of the messages
+        self.decompressor = None        # FrameDecompressor if compression has been negotiated
+        self.peer = None                # address of the client, frames are traced with it
+        self.chunk = bytearray(RCV_BUFFSIZE)
+        self.chunk_view = memoryview(self.chunk)
+
+    def recv_from(self, sock):
+        """
+        Read bytes available in the socket. Should be called when socket is readable.
+        Raise EOFError if socket has been closed.
+        @return:    (int)   : number of bytes read, 0 if there was nothing to read
+        """
+        try:
+            nbytes = sock.recv_into(self.chunk)
+        except BlockingIOError:
+            return 0
+        if not nbytes:
+            raise EOFError("socket closed while reading data")
+        self.feed(self.chunk_view[:nbytes])
+        return nbytes
+
+    def feed(self, data):
+        self.buffer += data
+
+    def next_frame(self):
+        """
+        Returns next complete message (dict tag: value) or None if it has not been received yet.
+        Raise ClearClientException if length header is malformed, stream can not be decoded anymore.
+        Raise ValueError if message contains unknown tag, the message is skipped.
+        """
+        header_len = LENGTH_LEN if self.protocol == PROTOCOL_V1 else V2_LENGTH.size
+        available = len(self.buffer) - self.offset
+        if available < header_len:
+            self.compact()
+            return None
+
+        if self.protocol == PROTOCOL_V1:
+            try:
+                msg_len = int(self.buffer[self.offset:self.offset + LENGTH_LEN])
+            except ValueError:
+                raise ClearClientException("Malformed message length")
+        else:
+            header = V2_LENGTH.unpack_from(self.buffer, self.offset)[0]
+            msg_len = header & V2_LENGTH_MASK
+        if not 0 <= msg_len <= MAX_MSG_LEN:
+            raise ClearClientException("Message length {} out of range".format(msg_len))
+
+        if available < header_len + msg_len:
+            self.compact()
+            return None
+
+        start = self.offset + header_len
+        if tracing.enabled:
+            tracing.record(tracing.RECEIVED, self.peer, self.protocol, self.buffer[self.offset:start + msg_len])
+        self.offset = start + msg_len
+        if self.protocol == PROTOCOL_V1:
+            return decode_tlv(self.buffer[start:self.offset].decode("utf-8"))
+        body = self.buffer[start:self.offset]
+        if header & V2_COMPRESSED:
+            body = decompress_body(self.decompressor, body, header)
+        return decode_tlv_v2(body)
+
+    def pending(self):
+        """ Returns bytes received but not decoded yet """
+        return bytes(self.buffer[self.offset:])
+
+    def compact(self):
+        """ Drop decoded messages from the buffer """
+        if self.offset == len(self.buffer):
+            self.buffer.clear()
+            self.offset = 0
+        elif self.offset >= RCV_BUFFSIZE:
+            del self.buffer[:self.offset]
+            self.offset = 0
+
+
+def flush_write_batch(batch, on_error):
+    """
+    Called by an event loop at the end of the iteration. Writes messages that connections queued during
+    the iteration, all messages of a connection with one syscall.
+    @param batch:       (set)       : connections with queued messages, emptied
+    @param on_error:    (callable)  : on_error(conn, exception) if connection is broken or too slow
+    """
+    while batch:    # handling an error can queue messages for other connections
+        conn = batch.pop()
+        try:
+            conn.flush()
+        except (OSError, ClearClientException) as e:
+            on_error(conn, e)
+
+
 # TLV functions
-def create_tlv():
-   return TLV(TLV_TAGS)
+class TlvMessage:
+    """ TLV message to send. It is encoded once for every framing version it is sent with. """
+
+    __slots__ = ("data", "frames")
+
+    def __init__(self, data_dict):
+        self.data = data_dict       # tag: value (str or list)
+        self.frames = {}            # protocol: frame
+
+    @property
+    def tlv_string(self):
+        return encode_tlv(self.data)
+
+    def get_frame(self, protocol=PROTOCOL_V1):
+        """ Returns message with length header, encoded and ready to be written to the socket """
+        frame = self.frames.get(protocol)
+        if frame is None:
+            frame = self.frames[protocol] = encode_frame(self.data, protocol)
+        return frame
+
+    def extend(self, data_dict):
+        """ Returns this message with tags of data_dict added, see ExtendedTlvMessage """
+        return ExtendedTlvMessage(self, data_dict)
+
+
+class ExtendedTlvMessage(TlvMessage):
+    """
+    Message shared by many clients with a few tags of one client added (e.g. request id). Frames of the
+    shared message are reused, only the added tags are encoded and appended to them.
+    """
+
+    __slots__ = ("base", "added")
+
+    def __init__(self, base, data_dict):
+        super().__init__({**base.data, **data_dict})
+        self.base = base
+        self.added = data_dict
+
+    def get_frame(self, protocol=PROTOCOL_V1):
+        frame = self.frames.get(protocol)
+        if frame is None:
+            frame = self.frames[protocol] = extend_frame(self.base.get_frame(protocol), self.added, protocol)
+        return frame
+
+
+def encode_frame(data_dict, protocol=PROTOCOL_V1):
+    """ Raise ValueError if the message is longer than MAX_MSG_LEN, receiver would drop the connection """
+    if protocol == PROTOCOL_V1:
+        body = encode_tlv(data_dict).encode("utf-8")
+        return v1_length(body) + body
+    body = encode_tlv_v2(data_dict)
+    return v2_length(body) + body
+
+
+def extend_frame(frame, data_dict, protocol=PROTOCOL_V1):
+    """ Returns frame with tags of data_dict appended to its message, tags of the frame are not encoded again """
+    if protocol == PROTOCOL_V1:
+        body = frame[LENGTH_LEN:] + encode_tlv(data_dict).encode("utf-8")
+        return v1_length(body) + body
+    body = frame[V2_LENGTH.size:] + encode_tlv_v2(data_dict)
+    return v2_length(body) + body
+
+
+def v1_length(body):
+    check_msg_len(body)
+    return f"{len(body) :< {LENGTH_LEN}}".encode("utf-8")
+
+
+def v2_length(body):
+    check_msg_len(body)
+    return V2_LENGTH.pack(len(body))
+
+
+def check_msg_len(body):
+    if len(body) > MAX_MSG_LEN:
+        raise ValueError("Message of {} bytes is longer than {}".format(len(body), MAX_MSG_LEN))
+
+
+def max_value_len(protocol):
+    """ Returns the longest value a message of the framing version can carry """
+    return V1_MAX_VALUE_LEN if protocol == PROTOCOL_V1 else V2_MAX_VALUE_LEN
+
+
+class FrameCompressor:
+    """ Compresses protocol v2 frames sent to one connection, frames must be sent in the order they were compressed """
+
+    def __init__(self, level=COMPRESSION_LEVEL):
+        self.compressor = zlib.compressobj(level, zdict=COMPRESSION_DICT)
+        self.stream_start = V2_STREAM_START
+
+    def compress_frame(self, frame):
+        """ Returns compressed frame for v2 frame (with length header) """
+        body = self.compressor.compress(frame[V2_LENGTH.size:]) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        header = len(body) | V2_COMPRESSED | self.stream_start
+        self.stream_start = 0
+        return V2_LENGTH.pack(header) + body
+
+
+class FrameDecompressor:
+    """ Decompresses frames received by one connection """
+
+    def __init__(self):
+        self.decompressor = None
+
+    def decompress(self, body, stream_start=False):
+        """ Raise ValueError if data is corrupted or message is longer than MAX_MSG_LEN """
+        if stream_start or self.decompressor is None:
+            self.decompressor = zlib.decompressobj(zdict=COMPRESSION_DICT)
+        try:
+            data = self.decompressor.decompress(body, MAX_MSG_LEN)
+        except zlib.error as e:
+            raise ValueError("Cannot decompress message: " + str(e))
+        if self.decompressor.unconsumed_tail:
+            raise ValueError("Decompressed message is longer than {}".format(MAX_MSG_LEN))
+        return data
+
+
+def decompress_body(decompressor, body, header):
+    if decompressor is None:
+        raise ValueError("Compressed message received, compression has not been negotiated")
+    return decompressor.decompress(body, header & V2_STREAM_START)
+
+
+def hexify_length(value_len):
+    """ Length field of a value with value_len chars (even number, at most V1_MAX_VALUE_LEN) """
+    return TLV_LENGTHS[value_len // 2]
+
+
+def encode_tlv(data_dict):
+    """
+    Build TLV string from dictionary tag: value. Lists are serialized, values are padded to even length.
+    Raise ValueError if a value is longer than V1_MAX_VALUE_LEN chars, the receiver could not parse it.
+    @param data_dict:   (dict)  : tag: value (str or list)
+    @return:            (str)   : TLV string
+    """
+    parts = []
+    for tag, value in data_dict.items():
+        if isinstance(value, list):
+            value = serialize_list(value)
+        if not value:
+            break
+        if len(value) % 2:
+            value = PADDING_CHAR + value
+        if len(value) > V1_MAX_VALUE_LEN:
+            raise ValueError("Value of tag {} is longer than {} chars".format(tag, V1_MAX_VALUE_LEN))
+        parts.append(tag)
+        parts.append(hexify_length(len(value)))
+        parts.append(value.upper())
+    return "".join(parts)
+
+
+def decode_tlv(msg):
+    """
+    Parse TLV string (frame without length header) into dictionary tag: value without padding.
+    Raise ValueError if message contains unknown tag or is malformed.
+    """
+    parsed_msg = {}
+    msg_len = len(msg)
+    i = 0
+    while i < msg_len:
+        tag = msg[i:i + TLV_TAG_LEN]
+        if tag not in TLV_TAG_SET:
+            raise ValueError("Unknown tag found: " + msg[i:i + 10])
+        value_start = i + TLV_TAG_LEN + TLV_LENGTH_LEN
+        try:
+            value_end = value_start + 2 * int(msg[i + TLV_TAG_LEN:value_start], 16)
+        except ValueError:
+            raise ValueError("Parse error: tag " + tag + " has incorrect data length")
+        if value_end > msg_len:
+            raise ValueError("Parse error: tag " + tag + " declared more data than message has")
+
+        value = msg[value_start:value_end]
+        if PADDING_CHAR in value:
+            value = value.replace(PADDING_CHAR, "")
+        parsed_msg[tag] = value
+        i = value_end
+
+    return parsed_msg
+
+
+def encode_tlv_v2(data_dict):
+    """
+    Build binary TLV message (protocol v2) from dictionary tag: value. Values are not padded nor changed.
+    Raise ValueError if a value is longer than V2_MAX_VALUE_LEN bytes.
+    @param data_dict:   (dict)  : tag: value (str or list)
+    @return:            (bytes) : message without length header
+    """
+    parts = []
+    for tag, value in data_dict.items():
+        if isinstance(value, list):
+            value = serialize_list(value)
+        value = value.encode("utf-8")
+        if len(value) > V2_MAX_VALUE_LEN:
+            raise ValueError("Value of tag {} is longer than {} bytes".format(tag, V2_MAX_VALUE_LEN))
+        parts.append(V2_TLV_HEADER.pack(TLV_TAG_CODES[tag], len(value)))
+        parts.append(value)
+    return b"".join(parts)
+
+
+def decode_tlv_v2(msg):
+    """
+    Parse binary TLV message (protocol v2, without length header) into dictionary tag: value.
+    Raise ValueError if message contains unknown tag or is malformed.
+    """
+    parsed_msg = {}
+    msg_len = len(msg)
+    header_len = V2_TLV_HEADER.size
+    i = 0
+    while i < msg_len:
+        if i + header_len > msg_len:
+            raise ValueError("Parse error: truncated tag")
+        code, value_len = V2_TLV_HEADER.unpack_from(msg, i)
+        tag = TLV_TAG_NAMES.get(code)
+        if tag is None:
+            raise ValueError("Unknown tag found: {:04X}".format(code))
+        value_start = i + header_len
+        i = value_start + value_len
+        if i > msg_len:
+            raise ValueError("Parse error: tag " + tag + " declared more data than message has")
+        parsed_msg[tag] = msg[value_start:i].decode("utf-8")
+
+    return parsed_msg
+
 
 def isTlvMsgValid(msg):
     if PADDING_CHAR in msg:
@@ -96,50 +466,44 @@ def add_tlv_padding(msg):
 def remove_tlv_padding(msg):
     return msg.replace(PADDING_CHAR, "")
 
-def add_tlv_tag(tag, msg, tlv = None):
+def add_tlv_tag(tag, msg):
     if isTlvMsgValid(msg) == False:
         raise Exception("Message", msg, "contains | sign. It is not valid tlv message")
 
-    msg = add_tlv_padding(msg)
-
-    if tlv == None:
-        tlv = create_tlv()
-
-    tlv.build({tag: msg})
-    return tlv
+    return TlvMessage({tag: msg})
     
 def build_tlv_with_tags(data_dict):
-    tlv = create_tlv()
-
-    parsed_dict = {}
-    for tag, value in data_dict.items():
-        if isinstance(value, list):
-            value = serialize_list(value)
-        parsed_dict[tag] = add_tlv_padding(value)
-
-    network_logger.debug("Build tlv with dictionary after padding: {}".format(parsed_dict))
-    
-    tlv.build(parsed_dict)
-    return tlv
-
-def sendTlv(sock, tlv):
-    message_to_send = tlv.tlv_string
-    network_logger.debug("Sending TLV: " + message_to_send)
-
-    sendText(sock, create_msg(message_to_send))  
-
-def recvTlv(sock):      # !TODO handle EOFError
-    msg_len = (recvall(sock, LENGTH_LEN).decode("utf-8"))
-    network_logger.debug("msg len: " + msg_len)
-    msg_len = int(msg_len)
-    msg = recvall(sock, msg_len).decode("utf-8")
-    tlv = create_tlv()
-    network_logger.debug("recvTlv msg: " + msg)
-    parsed_msg = tlv.parse(msg)
-    for key, value in parsed_msg.items():
-        parsed_msg[key] = remove_tlv_padding(value)
-
-    return parsed_msg
+    return TlvMessage(data_dict)
+
+def frame_tlv(tlv, protocol=PROTOCOL_V1):
+    """Returns TLV message with length header, encoded and ready to be written to the socket"""
+    return tlv.get_frame(protocol)
+
+def sendTlv(sock, tlv, protocol=PROTOCOL_V1):
+    frame = frame_tlv(tlv, protocol)
+    if tracing.enabled:
+        tracing.record(tracing.SENT, None, protocol, frame)
+    sendBytes(sock, frame)
+
+def parse_tlv_msg(msg):
+    """Parse TLV string (frame without length header) into dictionary tag: value without padding"""
+    return decode_tlv(msg)
+
+def recvTlv(sock, protocol=PROTOCOL_V1, decompressor=None):      # !TODO handle EOFError
+    if protocol != PROTOCOL_V1:
+        header = V2_LENGTH.unpack(recvall(sock, V2_LENGTH.size))[0]
+        body = recvall(sock, header & V2_LENGTH_MASK)
+        if header & V2_COMPRESSED:
+            body = decompress_body(decompressor, body, header)
+        if tracing.enabled:     # traced as if it was not compressed
+            tracing.record(tracing.RECEIVED, None, protocol, V2_LENGTH.pack(len(body)) + body)
+        return decode_tlv_v2(body)
+
+    header = recvall(sock, LENGTH_LEN)
+    msg = recvall(sock, int(header))
+    if tracing.enabled:
+        tracing.record(tracing.RECEIVED, None, protocol, header + msg)
+    return parse_tlv_msg(msg.decode("utf-8"))
 
 def get_types(tlv_msg):
     """Return list of tlv message tags"""
@@ -183,6 +547,27 @@ def serialize_list(l):
     return f"{LIST_DELIMITER}".join(l)
 
 
+def split_list(l, max_len):
+    """
+    Split list into parts, every part serialized is at most max_len chars long (item longer than that is a part alone).
+    @param l:           (list)  : items (str)
+    @param max_len:     (int)   : e.g. max_value_len of the framing version the parts are sent with
+    @return:            (list)  : lists of items, in order
+    """
+    parts = []
+    part = []
+    size = 0
+    for item in l:
+        if part and size + len(LIST_DELIMITER) + len(item) > max_len:
+            parts.append(part)
+            part = []
+        size = size + len(LIST_DELIMITER) + len(item) if part else len(item)
+        part.append(item)
+    if part:
+        parts.append(part)
+    return parts
+
+
 def deserialize_list(string):
     """ string -> list (PADDING_CHAR split)"""
     return string.split(LIST_DELIMITER)
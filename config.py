@@ -0,0 +1,50 @@
+import configparser
+import os
+
+
+CONFIG_SECTION = "server"
+ENV_PREFIX = "DGA_"
+
+
+def parse_value(name, value, default):
+    """ Convert text from config file or environment to the type of the default value """
+    if isinstance(default, bool):
+        if value.lower() in ("1", "yes", "true", "on"):
+            return True
+        if value.lower() in ("0", "no", "false", "off"):
+            return False
+        raise ValueError(f"{name}: expected boolean, got {value}")
+    if isinstance(default, (int, float)):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)     # e.g. timeout in seconds
+    return value
+
+
+def load_overrides(defaults, names, path, environ=os.environ):
+    """
+    Read values of settings from config file and environment. Environment wins over the file.
+    File is optional, it has [server] section with lowercase names, e.g. max_rooms = 1000.
+    Environment variables are prefixed, e.g. DGA_MAX_ROOMS=1000.
+    :param defaults:    (dict)  : current settings, name: value
+    :param names:       (list)  : names of the settings that can be changed
+    :param path:        (str)   : path to the config file
+    :param environ:     (dict)  : environment variables
+    :return:            (dict)  : name: value of overridden settings, raises ValueError on wrong value
+    """
+    overrides = {}
+    parser = configparser.ConfigParser()
+    if path and parser.read(path) and parser.has_section(CONFIG_SECTION):
+        for key, value in parser.items(CONFIG_SECTION):
+            name = key.upper()
+            if name not in names:
+                raise ValueError(f"{path}: unknown setting {key}")
+            overrides[name] = parse_value(name, value, defaults[name])
+
+    for name in names:
+        value = environ.get(ENV_PREFIX + name)
+        if value is not None:
+            overrides[name] = parse_value(name, value, defaults[name])
+
+    return overrides
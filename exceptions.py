@@ -24,6 +24,11 @@ class YouAreAloneException(Error):  # !TODO change name
 class UnsubscribeException(Error):
     pass
 
+
+class OverloadedException(Error):
+    """ Raised when server does not accept new connections or rooms because it is overloaded """
+    pass
+
 class UnknownTagException(Error):
     """ Called if unknown tag is received """
     pass
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Structured board state, sent to the clients instead of the text board (protocol v2).
+Snapshot and delta are lists of entries "<kind><args>=<name>":
+    S<start field>=<player>     player and their start field, snapshot only
+    P<field>=<figure>           figure placed on the field
+    M<from>-<to>=<figure>       figure moved
+    B<field>=<figure>           figure banned from the field, back in the start pit
+    F<slot>=<figure>            figure finished in the slot
+First entry of a snapshot is number of fields. Figures that are not listed are in the start pit.
+"""
+from game.figure import Figure
+
+START = "S"
+PLACED = "P"
+MOVED = "M"
+BANNED = "B"
+FINISHED = "F"
+
+
+def get_positions(game):
+    """
+    Returns positions of the figures that are not in the start pit.
+    @param game:    (Game)
+    @return:        (dict)  : figure name: (PLACED, field) or (FINISHED, slot)
+    """
+    positions = {}
+    for field, figure in enumerate(game.game_board.fields):
+        if isinstance(figure, Figure):
+            positions[figure.name] = (PLACED, field)
+    for player in game.players:
+        for slot, figure in enumerate(player.finished_figures):
+            if isinstance(figure, Figure):
+                positions[figure.name] = (FINISHED, slot)
+    return positions
+
+
+def snapshot_entries(game, positions):
+    """ Returns entries of the whole board, positions as returned by get_positions """
+    board = game.game_board
+    entries = [str(board.field_amount)]
+    entries += ["{}{}={}".format(START, start, name) for name, start in zip(board.players, board.players_start_pos)]
+    entries += ["{}{}={}".format(kind, where, name) for name, (kind, where) in positions.items()]
+    return entries
+
+
+def delta_entries(before, after):
+    """ Returns entries that change positions before into positions after """
+    entries = ["{}{}={}".format(BANNED, where, name) for name, (kind, where) in before.items() if name not in after]
+    for name, (kind, where) in after.items():
+        old = before.get(name)
+        if old == (kind, where):
+            continue
+        if kind == PLACED and old is not None and old[0] == PLACED:
+            entries.append("{}{}-{}={}".format(MOVED, old[1], where, name))
+        else:
+            entries.append("{}{}={}".format(kind, where, name))
+    return entries
+
+
+class BoardState:
+    """ Board rebuilt by the client from snapshot and deltas sent by the server """
+
+    def __init__(self):
+        self.field_amount = 0
+        self.start_fields = {}      # player: start field
+        self.positions = {}         # figure name: (PLACED, field) or (FINISHED, slot)
+
+    def apply(self, entries, snapshot=False):
+        """
+        Update the state.
+        @param entries:     (list)  : entries of snapshot or delta
+        @param snapshot:    (bool)  : entries describe the whole board
+        """
+        if snapshot:
+            self.field_amount = int(entries[0])
+            self.start_fields = {}
+            self.positions = {}
+            entries = entries[1:]
+
+        for entry in entries:
+            kind = entry[0]
+            args, _, name = entry[1:].partition("=")
+            if kind == START:
+                self.start_fields[name] = int(args)
+            elif kind == BANNED:
+                self.positions.pop(name, None)
+            elif kind == MOVED:
+                self.positions[name] = (PLACED, int(args.partition("-")[2]))
+            elif kind in (PLACED, FINISHED):
+                self.positions[name] = (kind, int(args))
+
+    def display_board(self):
+        """ Same view as Board.display_board """
+        fields = ["{:02}".format(i) for i in range(self.field_amount)]
+        for name, (kind, where) in self.positions.items():
+            if kind == PLACED:
+                fields[where] = name
+        return "\n|" + "|".join(fields) + "|\n"
+
+    def get_player_status(self, player, figure_amount=4):
+        """ Same description as Game.get_player_status """
+        figures = ["{}-{}".format(player, x) for x in range(figure_amount)]
+        start_figures = [name for name in figures if name not in self.positions]
+        finished_figures = sorted((name for name in figures if self.positions.get(name, ("",))[0] == FINISHED),
+                                  key=lambda name: self.positions[name][1])
+        start_positions = "".join("Player {} starting position: {} \n".format(name, start)
+                                  for name, start in self.start_fields.items())
+        return """
+        Figures have not placed yet: {}
+        Figures finished: {}
+        Board: {}
+{}
+        """.format(", ".join(start_figures), ", ".join(finished_figures), self.display_board(), start_positions)
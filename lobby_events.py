@@ -0,0 +1,102 @@
+"""
+Lobby events pushed to the connections subscribed with TLV_SUBSCRIBE_TAG, instead of polling GET_ROOMS.
+Events of LOBBY_EVENT_WINDOW are coalesced, only the last state of every changed room is sent, in one
+TLV_LOBBY_EVENTS_TAG message encoded once for all the subscribers. Entries of the message:
+    C<rnum>:<members>:<seats>:<state>   room created
+    U<rnum>:<members>:<seats>:<state>   client joined or left the room or game started
+    X<rnum>                             room closed
+Room state is the entry of the room listing (room_listing.py). Room created and closed within one
+window is not sent at all. The window starts with its first event, idle lobby runs no timer.
+"""
+import threading
+from room_listing import room_entry, parse_entry
+
+CREATED = "C"
+UPDATED = "U"
+CLOSED = "X"
+
+
+class LobbyEvents:
+    """
+    Subscribed connections and rooms changed since the last window. Rooms are closed by game worker
+    threads too, changes are recorded under a lock and sent by a timer of the lobby loop. room_changed
+    and room_closed return True for the first event of a window, the caller starts the window then.
+    """
+
+    def __init__(self):
+        self.subscribers = set()    # Connection(s)
+        self.pending = {}       # rnum: CREATED, UPDATED or CLOSED, events of the current window
+        self.lock = threading.Lock()
+        self.timer = None       # timer that ends the current window
+        self.timers = None      # timers of the lobby loop, set by the first subscription
+        self.owner = None       # thread id of the lobby loop
+        self.wakeup = None      # thread safe callable, asks the lobby loop to start the window
+
+    def room_changed(self, rnum, created=False):
+        if not self.subscribers:
+            return False
+        with self.lock:
+            opened = not self.pending
+            kind = self.pending.get(rnum)
+            if created:
+                # room closed and created again within the window is a change of the room
+                self.pending[rnum] = UPDATED if kind == CLOSED else CREATED
+            elif kind is None:
+                self.pending[rnum] = UPDATED
+        return opened
+
+    def room_closed(self, rnum):
+        if not self.subscribers:
+            return False
+        with self.lock:
+            opened = not self.pending
+            if self.pending.get(rnum) == CREATED:
+                del self.pending[rnum]      # subscribers have not seen the room
+            else:
+                self.pending[rnum] = CLOSED
+        return opened and bool(self.pending)
+
+    def take(self):
+        """ Returns events of the window that ends, next events go to a new window """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending
+
+
+def event_entries(pending, rooms):
+    """
+    Returns entries of the events message.
+    @param pending: (dict)  : rnum: kind, as returned by LobbyEvents.take
+    @param rooms:   (dict)  : rnum: Room, rooms of the RoomManager
+    """
+    entries = []
+    for rnum, kind in pending.items():
+        room = rooms.get(rnum)
+        if kind == CLOSED or room is None:      # closed by a game worker after the window ended
+            entries.append(CLOSED + str(rnum))
+        else:
+            entries.append(kind + room_entry(room))
+    return entries
+
+
+class LobbyState:
+    """ Rooms known to the client, kept up to date by the lobby events """
+
+    def __init__(self):
+        self.rooms = {}     # rnum: (members, seats, state)
+
+    def load(self, entries):
+        """ Add rooms of a room listing page (entries after the number of rooms). Must be applied in the order
+        the page and the events were received, both carry the state of the room at the time they were sent. """
+        for entry in entries:
+            rnum, members, seats, state = parse_entry(entry)
+            self.rooms[rnum] = (members, seats, state)
+
+    def apply(self, entries):
+        for entry in entries:
+            kind, value = entry[0].upper(), entry[1:]
+            if kind == CLOSED:
+                self.rooms.pop(int(value), None)
+            else:
+                rnum, members, seats, state = parse_entry(value)
+                self.rooms[rnum] = (members, seats, state)
@@ -0,0 +1,37 @@
+from settings import MAX_CLIENTS_PER_ROOM
+
+
+class FreeSeatIndex:
+    """
+    Rooms open for quick-join, bucketed by the number of free seats. Rooms with a running game
+    and full rooms are not in the index. Update, discard and best are O(1), the number of buckets
+    is MAX_CLIENTS_PER_ROOM. Rooms in a bucket are kept in the order they got there.
+    """
+
+    def __init__(self, capacity=MAX_CLIENTS_PER_ROOM):
+        self.capacity = capacity
+        self.buckets = [{} for _ in range(capacity + 1)]    # free seats: {rnum: Room}, bucket 0 is never used
+        self.free_seats = {}    # rnum: bucket the room is in
+
+    def update(self, room):
+        """ Put the room to the bucket of its free seats, or drop it if it is full or playing """
+        self.discard(room.rnum)
+        free = self.capacity - len(room)
+        if free > 0 and room.game is None:
+            self.buckets[free][room.rnum] = room
+            self.free_seats[room.rnum] = free
+
+    def discard(self, rnum):
+        free = self.free_seats.pop(rnum, None)
+        if free is not None:
+            del self.buckets[free][rnum]
+
+    def best(self):
+        """ Returns the fullest room that has a free seat (a game starts soonest there), None if there is none """
+        for bucket in self.buckets[1:]:
+            if bucket:
+                return next(iter(bucket.values()))
+        return None
+
+    def __len__(self):
+        return len(self.free_seats)
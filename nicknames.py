@@ -0,0 +1,47 @@
+import threading
+
+
+class NicknameRegistry:
+    """
+    Nicknames of the clients connected to the server process, each nickname is owned by one connection.
+    Nicknames differing only in case are the same nickname (v1 framing sends them upper case).
+    Reserve and release are O(1) and thread safe, connections are closed by game worker threads too.
+    """
+
+    def __init__(self):
+        self.owners = {}    # normalized nickname: connection
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(nickname):
+        return nickname.casefold()
+
+    def reserve(self, nickname, owner, previous=None):
+        """
+        Reserve nickname for the owner unless another connection has it.
+        :param nickname:    (str)           : requested nickname
+        :param owner:       (Connection)    : connection that requests it
+        :param previous:    (str)           : nickname the owner had so far, released if the new one is reserved
+        :return:            (bool)          : True if owner has the nickname now
+        """
+        key = self.normalize(nickname)
+        previous_key = self.normalize(previous) if previous is not None else key
+        with self.lock:
+            if self.owners.setdefault(key, owner) is not owner:
+                return False
+            if previous_key != key and self.owners.get(previous_key) is owner:
+                del self.owners[previous_key]
+        return True
+
+    def release(self, nickname, owner):
+        """ Free the nickname if it belongs to the owner, e.g. when the owner disconnects """
+        key = self.normalize(nickname)
+        with self.lock:
+            if self.owners.get(key) is owner:
+                del self.owners[key]
+
+    def __contains__(self, nickname):
+        return self.normalize(nickname) in self.owners
+
+    def __len__(self):
+        return len(self.owners)
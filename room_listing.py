@@ -0,0 +1,108 @@
+"""
+Structured room listing, answer to TLV_LIST_ROOMS_TAG. Rooms are listed in room number order, one page
+per request. Request value is a list of options, all optional:
+    open                only rooms a client can join (free seat, game not started)
+    waiting             only rooms where game has not started
+    from=<rnum>         first room number of the range
+    to=<rnum>           last room number of the range
+    after=<rnum>        cursor, page starts after this room (TLV_CURSOR_TAG of the previous page)
+    limit=<n>           rooms in the page, ROOM_LIST_PAGE_SIZE by default, ROOM_LIST_PAGE_MAX at most
+Answer is a list of entries, the first one is number of rooms on the server, then one per room:
+    <rnum>:<members>:<seats>:<state>    state is W (waiting for players) or P (playing)
+TLV_CURSOR_TAG is sent with the answer if there are more rooms, it is the value of "after" for the next page.
+Page is cut shorter if its entries do not fit into one value of the framing version (510 chars in v1).
+"""
+from bisect import bisect_left, bisect_right
+from settings import MAX_CLIENTS_PER_ROOM, ROOM_LIST_PAGE_SIZE, ROOM_LIST_PAGE_MAX
+
+ALL = "all"
+WAITING = "waiting"
+OPEN = "open"
+
+STATE_WAITING = "W"
+STATE_PLAYING = "P"
+
+
+class RoomListingIndex:
+    """
+    Room numbers in order, for every filter its own sorted list: all rooms, rooms with no game running
+    and rooms open for joining (subset of the waiting ones). A page is found by binary search and sliced,
+    so it costs O(log rooms + page size) whatever the filters skip. Insert and remove move the tail of
+    the lists (one memmove), room numbers are only added and removed when rooms change.
+    """
+
+    def __init__(self):
+        self.rnums = {ALL: [], WAITING: [], OPEN: []}
+
+    def update(self, room):
+        """ Put room number to the lists of the filters it matches now, remove it from the others """
+        waiting = room.game is None
+        matches = {ALL: True, WAITING: waiting, OPEN: waiting and len(room) < MAX_CLIENTS_PER_ROOM}
+        for kind, rnums in self.rnums.items():
+            set_member(rnums, room.rnum, matches[kind])
+
+    def remove(self, rnum):
+        for rnums in self.rnums.values():
+            set_member(rnums, rnum, False)
+
+    def page(self, kind=ALL, first=1, last=None, after=0, limit=ROOM_LIST_PAGE_SIZE):
+        """
+        Returns room numbers of one page and if there are more after it.
+        @param kind:    (str)   : ALL, WAITING or OPEN
+        @param first:   (int)   : lowest room number listed
+        @param last:    (int)   : highest room number listed, None is no limit
+        @param after:   (int)   : cursor, only rooms with higher number are listed
+        @param limit:   (int)   : page size
+        @return:        (list, bool)
+        """
+        rnums = self.rnums[kind]
+        start = bisect_left(rnums, max(first, after + 1))
+        end = bisect_right(rnums, last) if last is not None else len(rnums)
+        page = rnums[start:min(start + limit, end)]
+        return page, start + limit < end
+
+
+def set_member(rnums, rnum, member):
+    """ Insert rnum to the sorted list or remove it from there """
+    i = bisect_left(rnums, rnum)
+    present = i < len(rnums) and rnums[i] == rnum
+    if member and not present:
+        rnums.insert(i, rnum)
+    elif present and not member:
+        del rnums[i]
+
+
+def parse_options(options):
+    """
+    Returns arguments of RoomListingIndex.page for the options of the request.
+    Raise ValueError if an option is unknown or its value is not a number.
+    """
+    args = {"kind": ALL, "first": 1, "last": None, "after": 0, "limit": ROOM_LIST_PAGE_SIZE}
+    for option in options:
+        name, _, value = option.strip().lower().partition("=")
+        if not name or name == "-":
+            continue
+        if name == OPEN:
+            args["kind"] = OPEN
+        elif name == WAITING:
+            if args["kind"] != OPEN:    # open rooms are waiting too
+                args["kind"] = WAITING
+        elif name in ("from", "to", "after", "limit"):
+            if not value.isdigit():
+                raise ValueError("Option {} needs a number".format(name))
+            args[{"from": "first", "to": "last"}.get(name, name)] = int(value)
+        else:
+            raise ValueError("Unknown option {}".format(option))
+    args["limit"] = max(1, min(args["limit"], ROOM_LIST_PAGE_MAX))
+    return args
+
+
+def room_entry(room):
+    state = STATE_WAITING if room.game is None else STATE_PLAYING
+    return "{}:{}:{}:{}".format(room.rnum, len(room), MAX_CLIENTS_PER_ROOM, state)
+
+
+def parse_entry(entry):
+    """ Returns (rnum, members, seats, state) of the room entry """
+    rnum, members, seats, state = entry.split(":")
+    return int(rnum), int(members), int(seats), state.upper()
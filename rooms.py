@@ -1,11 +1,21 @@
+import threading
 from settings import *
 from exceptions import *
-from threading_game import GameThread
+from common import TLV_INFO_TAG, TLV_LOBBY_EVENTS_TAG, PROTOCOL_V1, build_tlv_with_tags, max_value_len, split_list
+from threading_game import GameSession
+from matchmaking import FreeSeatIndex
+from room_listing import RoomListingIndex, room_entry
+from lobby_events import LobbyEvents, event_entries
 from game.logger_conf import server_logger
 
+DESCRIPTION_RESERVE = 128   # chars of the value left for the welcome text around the rooms description
+
 
 class Room:
 
+    game_class = GameSession    # game runner, driven by the loop that handles the lobby
+    game_pool = None            # GameWorkerPool, if set games are moved off the lobby loop
+
     def __init__(self, rnum):
         self.rnum = rnum
         self.room_members = []      # <Connection>
@@ -52,8 +62,12 @@ class Room:
 
         server_logger.info("Starting game...")
 
-        game = GameThread(self.room_members, self.rnum)    # !TODO player number exception
-        game.start()
+        game = self.game_class(self.room_members, self.rnum)    # !TODO player number exception
+        if self.game_pool is not None:
+            self.game_pool.assign(game)
+        else:
+            game.start()
+        self.game = game
         return True
 
     def __len__(self):
@@ -68,6 +82,38 @@ class RoomManager:
     class __RoomManager:
         def __init__(self):     # init() is not a constructor
             self.rooms = {}     # rnum: Room
+            self.shard_id = 0   # this process owns rooms with rnum % nshards == shard_id
+            self.nshards = 1
+            self.admission = None   # AdmissionController, decides if new rooms can be created
+            self.free_seats = FreeSeatIndex()   # rooms quick-join can put a client to
+            self.listing = RoomListingIndex()   # room numbers in order, pages of the room listing
+            self.waiting = {}       # Connection: request id, quick-join clients waiting for a seat, oldest first
+            self.retry_timer = None     # retries waiting clients, rooms closed by games do not notify the lobby
+            self.next_rnum = None   # room number tried first for a new quick-join room
+            self.room_lines = {}    # rnum: line of the room in the rooms description
+            self.changes = 0        # counts changes of the rooms, cached description is valid for one value
+            self.rooms_info = None  # (changes, {protocol: TlvMessage with the rooms description}), see get_rooms_info
+            self.events = LobbyEvents()     # lobby connections subscribed to room changes
+            # game workers close rooms of finished games from their threads, rooms and the indexes above
+            # are changed and read under this lock
+            self.lock = threading.RLock()
+
+        def configure_shard(self, shard_id, nshards):
+            """
+            Make the manager own only a subset of room numbers. Used by worker processes of the sharded server.
+            :param shard_id:    (int)   : number of this worker, 0 .. nshards - 1
+            :param nshards:     (int)   : number of workers
+            """
+            self.shard_id = shard_id
+            self.nshards = nshards
+            self.next_rnum = None
+
+        def get_room_owner(self, rnum):
+            """ Returns shard_id of the worker that owns room rnum """
+            return rnum % self.nshards
+
+        def owns_room(self, rnum):
+            return self.get_room_owner(rnum) == self.shard_id
 
         def join_client(self, conn, rnum):
             """
@@ -75,24 +121,36 @@ class RoomManager:
             :param conn:        (Connection)    : client connection with the server
             :param rnum:        (int)           : number of room
             :return:            (bool)          : True if operation was successful
+            Raises OverloadedException if room cannot be created because server is overloaded.
             """
-            # check if client had joined any room before
-            if conn.cli.rnum > 0:
-                self.rooms[conn.cli.rnum].remove(conn)
-
-            # check if room exists
-            if rnum in self.rooms.keys():
-                try:
-                    self.rooms[rnum].join(conn)      # change cli -> conn
+            with self.lock:
+                self.cancel_wait(conn)
+                # check if client had joined any room before
+                if conn.cli.rnum > 0:
+                    self.leave_room(conn)
+
+                # check if room exists
+                if rnum in self.rooms.keys():
+                    try:
+                        self.rooms[rnum].join(conn)      # change cli -> conn
+                        self.room_changed(self.rooms[rnum])
+                        return True
+                    except MaxReachedException:
+                        server_logger.info("Room {} is full".format(rnum))
+                        return False
+
+                # if room with number rnum doesn't exist, create a new one
+                else:
+                    try:
+                        self.create_room(conn, rnum)     # join call create
+                    except MaxReachedException:
+                        server_logger.info("Cannot create room {}, max number of rooms reached".format(rnum))
+                        return False
+                    except WrongRNumException:
+                        server_logger.info("Cannot create room {}, it is owned by worker {}".format(
+                            rnum, self.get_room_owner(rnum)))
+                        return False
                     return True
-                except MaxReachedException:
-                    server_logger.info("Room {} is full".format(rnum))
-                    return False
-
-            # if room with number rnum doesn't exist, create a new one
-            else:
-                self.create_room(conn, rnum)     # join call create
-                return True
 
         def create_room(self, conn, rnum):
             """
@@ -102,59 +160,291 @@ class RoomManager:
             :param rnum:    (int)       : room number
             :return:        (bool)      : True if creation was successful
             """
-            if len(self.rooms) >= MAX_ROOMS:
-                raise MaxReachedException()
+            with self.lock:
+                if len(self.rooms) >= MAX_ROOMS:
+                    raise MaxReachedException()
 
-            if rnum in self.rooms.keys():
-                server_logger.warning("Room of the number {} already exists.".format(rnum))
-                # self.join_client(cli, rnum)
-                return False
+                if self.admission is not None:
+                    self.admission.admit_room()
+
+                if not self.owns_room(rnum):
+                    raise WrongRNumException()
+
+                if rnum in self.rooms.keys():
+                    server_logger.warning("Room of the number {} already exists.".format(rnum))
+                    # self.join_client(cli, rnum)
+                    return False
 
-            room = Room(rnum)
-            room.join(conn)
-            self.rooms[rnum] = room
+                room = Room(rnum)
+                room.join(conn)
+                self.rooms[rnum] = room
+                self.room_changed(room, created=True)
 
         def close_room(self, rnum):
-            if rnum not in self.rooms.keys():
-                raise WrongRNumException()
+            """ Called by the game when it ends, on the thread that runs the game """
+            with self.lock:
+                if rnum not in self.rooms.keys():
+                    raise WrongRNumException()
 
-            del self.rooms[rnum]
+                del self.rooms[rnum]
+                self.room_removed(rnum)
 
         def disconnect_client(self, conn):
-            try:
-                server_logger.debug(f"RM: Disconnect connection {repr(conn.cli)}")
-                self.rooms[conn.cli.rnum].remove(conn)
-                if self.rooms[conn.cli.rnum].is_empty():
-                    server_logger.info("Close room {}".format(conn.cli.rnum))
-                    del self.rooms[conn.cli.rnum]
-            except KeyError:
-                pass
+            self.cancel_wait(conn)
+            self.unsubscribe(conn)
+            with self.lock:
+                try:
+                    server_logger.debug(f"RM: Disconnect connection {repr(conn.cli)}")
+                    self.rooms[conn.cli.rnum].remove(conn)
+                    if self.rooms[conn.cli.rnum].is_empty():
+                        server_logger.info("Close room {}".format(conn.cli.rnum))
+                        del self.rooms[conn.cli.rnum]
+                        self.room_removed(conn.cli.rnum)
+                    else:
+                        self.room_changed(self.rooms[conn.cli.rnum])
+                except KeyError:
+                    pass
+            self.serve_waiting()
+
+        def leave_room(self, conn):
+            """ Remove client from its room, room stays open for other clients """
+            with self.lock:
+                room = self.rooms.get(conn.cli.rnum)
+                if room is not None:
+                    room.remove(conn)
+                    self.room_changed(room)
+                conn.cli.set_rnumber(0)
+
+        def room_changed(self, room, created=False):
+            """ Room was created, a client joined or left it or game started, update indexes and rooms description """
+            with self.lock:
+                self.free_seats.update(room)
+                self.listing.update(room)
+                self.room_lines[room.rnum] = "\n{}\n".format(room)
+                self.changes += 1
+                opened = self.events.room_changed(room.rnum, created)
+            if opened:
+                self.start_events_window()
+
+        def room_removed(self, rnum):
+            with self.lock:
+                self.free_seats.discard(rnum)
+                self.listing.remove(rnum)
+                self.room_lines.pop(rnum, None)
+                self.changes += 1
+                opened = self.events.room_closed(rnum)
+            if opened:
+                self.start_events_window()
+
+        def subscribe(self, conn, timers):
+            """
+            Push changes of the rooms to the lobby connection, see lobby_events.py.
+            :param conn:    (Connection)    : lobby connection
+            :param timers:  (TimerWheel)    : timers of the lobby loop, events are sent by them
+            """
+            self.events.subscribers.add(conn)
+            if timers is not None:
+                self.events.timers = timers
+                self.events.owner = threading.get_ident()
+
+        def start_events_window(self):
+            """
+            First event since the last window has been recorded, send_events ends the window after LOBBY_EVENT_WINDOW.
+            Game worker threads wake the lobby loop up, it calls this method again.
+            """
+            events = self.events
+            if threading.get_ident() != events.owner:
+                if events.wakeup is not None:
+                    events.wakeup()
+                return
+            if events.timer is None and events.timers is not None:
+                events.timer = events.timers.schedule(LOBBY_EVENT_WINDOW, self.send_events, events.timers)
+
+        def unsubscribe(self, conn):
+            self.events.subscribers.discard(conn)
+
+        def send_events(self, timers):
+            """
+            Timer callback, ends the coalescing window. Events of the window are sent to all the subscribers
+            as one message, encoded once per framing version, or as several ones if they do not fit into one value.
+            Next window starts with its first event (start_events_window), nothing runs while the lobby is idle.
+            """
+            self.events.timer = None
+            pending = self.events.take()
+            if not pending or not self.events.subscribers:
+                return
+            with self.lock:
+                entries = event_entries(pending, self.rooms)
+            messages = {}   # protocol: TlvMessage(s) with the entries
+            for conn in list(self.events.subscribers):
+                tlvs = messages.get(conn.protocol)
+                if tlvs is None:
+                    tlvs = messages[conn.protocol] = [build_tlv_with_tags({TLV_LOBBY_EVENTS_TAG: part})
+                                                      for part in split_list(entries, max_value_len(conn.protocol))]
+                try:
+                    for tlv in tlvs:
+                        conn.send_tlv(tlv)
+                except (OSError, ClearClientException) as e:     # client is disconnected by the loop that reads it
+                    server_logger.error(f"Error while sending lobby events to {repr(conn.cli)}: {str(e)}")
+
+        def start_game(self, room):
+            """ Start game in the room, room is not offered to quick-join anymore. Returns True if game started """
+            for conn in room.room_members:     # game takes the connections over, lobby does not write to them
+                self.unsubscribe(conn)
+            started = room.start_game()
+            self.room_changed(room)
+            return started
+
+        def quick_join(self, conn, request_id=None):
+            """
+            Put client to the fullest room with a free seat, or to a new room if there is none.
+            If no room can be created, client waits in the queue and is answered once a seat frees up.
+            Game starts as soon as the room is full.
+            :param conn:        (Connection)    : client connection with the server
+            :param request_id:  (str)           : id of the quick-join request, echoed in the deferred answer
+            :return:            (bool)          : True if client joined a room, False if it waits
+            """
+            self.cancel_wait(conn)
+            if conn.cli.rnum > 0:
+                self.leave_room(conn)
+            room = self.find_room(conn)
+            if room is None:
+                server_logger.info(f"No free seat for {repr(conn.cli)}, {len(self.waiting) + 1} client(s) waiting")
+                self.waiting[conn] = request_id
+                self.schedule_retry(conn.timers)
+                return False
+            self.seat(conn, room, request_id)
+            return True
+
+        def find_room(self, conn):
+            """ Join client to a room chosen by quick-join. Returns the room, None if there is no seat """
+            with self.lock:
+                room = self.free_seats.best()
+                if room is not None:
+                    room.join(conn)
+                    self.room_changed(room)
+                    return room
+
+                rnum = self.get_free_rnum()
+                try:
+                    self.create_room(conn, rnum)
+                except (MaxReachedException, OverloadedException) as e:
+                    server_logger.debug(f"Quick-join cannot create room {rnum}: {repr(e)}")
+                    return None
+                return self.rooms[rnum]
+
+        def seat(self, conn, room, request_id):
+            """ Answer quick-join request of the client that has joined the room, start the game if room is full """
+            conn.quick_joined(room.rnum, request_id)
+            if len(room) >= MAX_CLIENTS_PER_ROOM:
+                server_logger.info(f"Room {room.rnum} full, starting game")
+                self.start_game(room)
+
+        def get_free_rnum(self):
+            """ Returns number of a room this process owns that does not exist yet, next_rnum or the first free one after it """
+            with self.lock:
+                rnum = self.next_rnum
+                if rnum is None:    # first room number owned by this shard, numbers start from 1
+                    rnum = self.shard_id if self.shard_id > 0 else self.nshards
+                while rnum in self.rooms:
+                    rnum += self.nshards
+                self.next_rnum = rnum
+            return rnum
+
+        def cancel_wait(self, conn):
+            """ Remove client from the quick-join queue, client left or asked for another room """
+            self.waiting.pop(conn, None)
+
+        def serve_waiting(self):
+            """ Seat waiting clients, oldest first, while there are free seats or rooms can be created """
+            while self.waiting:
+                conn = next(iter(self.waiting))
+                room = self.find_room(conn)
+                if room is None:
+                    return
+                try:
+                    self.seat(conn, room, self.waiting.pop(conn))
+                except (OSError, ClearClientException) as e:     # client is disconnected by the loop that reads it
+                    server_logger.error(f"Error while answering quick-join of {repr(conn.cli)}: {str(e)}")
+
+        def schedule_retry(self, timers):
+            if self.retry_timer is None and timers is not None:
+                self.retry_timer = timers.schedule(MATCHMAKING_RETRY_INTERVAL, self.retry_waiting, timers)
+
+        def retry_waiting(self, timers):
+            """ Timer callback. Rooms of finished games are closed by game workers, seats are checked periodically """
+            self.retry_timer = None
+            self.serve_waiting()
+            if self.waiting:
+                self.schedule_retry(timers)
 
         def get_all_cli_joined(self):
             """
             Get list of all the clients that joined room.
             :return:    (list)  : list of Client(s)
             """
-            clients = [conn.cli for room in self.rooms.values() for conn in room.room_members]
+            with self.lock:
+                clients = [conn.cli for room in self.rooms.values() for conn in room.room_members]
             return clients
 
-        def get_all_nicknames(self):
-            nicknames = [conn.cli.name for room in self.rooms.values() for conn in room.room_members]
-            return nicknames
-
-        def get_rooms_description(self):
+        def get_rooms_description(self, protocol=PROTOCOL_V1):
             """
             Returns string that describes number of game rooms and number of players
-            in each room.
+            in each room. It fits into one value of the framing version.
             """
-            msg = "number of rooms created: {}".format(len(self.rooms))
-
-            for rnum, room in self.rooms.items():
-                msg += "\n"
-                msg += str(room)
-                msg += "\n"
+            return self.get_rooms_info(protocol).data[TLV_INFO_TAG]
 
-            return msg
+        def get_rooms_info(self, protocol=PROTOCOL_V1):
+            """
+            Returns message with the rooms description, shared by all the clients asking for it. It is built
+            once per framing version after a change of the rooms (from lines of the rooms updated by room_changed),
+            its frames are encoded once.
+            :param protocol:    (int)   : framing version, description is cut to the longest value it can carry
+            """
+            with self.lock:
+                cached = self.rooms_info
+                if cached is None or cached[0] != self.changes:
+                    cached = self.rooms_info = (self.changes, {})
+                tlv = cached[1].get(protocol)
+                if tlv is None:
+                    msg = self.describe_rooms(max_value_len(protocol) - DESCRIPTION_RESERVE)
+                    tlv = cached[1][protocol] = build_tlv_with_tags({TLV_INFO_TAG: msg})
+            return tlv
+
+        def describe_rooms(self, max_len):
+            """ Returns the rooms description, rooms that do not fit into max_len chars are only counted """
+            msg = "number of rooms created: {}".format(len(self.rooms))
+            lines = list(self.room_lines.values())
+            if len(msg) + sum(map(len, lines)) <= max_len:
+                return msg + "".join(lines)
+
+            more = "\n... {} more rooms, see the room listing\n"
+            size = len(msg) + len(more.format(len(lines)))
+            shown = 0
+            for line in lines:
+                size += len(line)
+                if size > max_len:
+                    break
+                shown += 1
+            return msg + "".join(lines[:shown]) + more.format(len(lines) - shown)
+
+        def list_rooms(self, protocol=PROTOCOL_V1, **page_args):
+            """
+            Returns one page of the room listing, see room_listing.py.
+            :param protocol:    (int)   : framing version, page is cut to rooms that fit into one value of it
+            :param page_args:   : arguments of RoomListingIndex.page
+            :return:            (list, str) : entries of the page, cursor of the next page or None
+            """
+            with self.lock:
+                page, more = self.listing.page(**page_args)
+                entries = [str(len(self.rooms))]
+                entries += [room_entry(self.rooms[rnum]) for rnum in page]
+            fit = len(split_list(entries, max_value_len(protocol))[0])
+            if fit < len(entries):      # v1 values are short, the rest of the page is the next one
+                page = page[:max(fit - 1, 1)]
+                entries = entries[:len(page) + 1]
+                more = True
+            return entries, str(page[-1]) if more else None
 
         def __str__(self):
             return self.get_rooms_description()
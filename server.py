@@ -1,35 +1,121 @@
+import os
 import socket
+import subprocess
 import sys
+import selectors
+import signal
+import struct
+import time
+from collections import deque
+from itertools import islice
 from common import *
 from settings import *
-import select
 from exceptions import *
-from rooms import RoomManager
+from rooms import Room, RoomManager
+from room_listing import parse_options
+from timers import TimerWheel
+from admission import AdmissionController
+from threading_game import GameWorkerPool
+from nicknames import NicknameRegistry
+import tracing
 from game.logger_conf import server_logger, server_fh, game_fh, network_fh
 import daemon
 
+try:
+    import fcntl
+    import termios
+    SIOCOUTQ = termios.TIOCOUTQ     # bytes in the kernel send queue not acknowledged by the peer
+except (ImportError, AttributeError):
+    SIOCOUTQ = None
+
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")     # not on Windows
+
 
 connection_list = {}   # all sockets handled by server
+selector = selectors.DefaultSelector()     # epoll on Linux, every socket is registered once
+congested_connections = set()   # connections with more than SND_HIGH_WATER bytes queued
+write_batch = set()     # connections with messages queued during current iteration of the server loop
+nicknames = NicknameRegistry()  # nicknames of the clients connected to this process
+timers = TimerWheel()   # timeouts of the lobby and games run by the server loop
+
+SERVER_SCRIPT = os.path.abspath(__file__)   # started again on restart, daemon changes working directory
+START_DIR = os.getcwd()
+
+# messages written to the restart control socket by signal handlers
+RESTART_REQUESTED = b"R"
+SUCCESSOR_READY = b"D"
 
 
-def get_all_nicknames():
-    nicknames = [conn.cli.name for conn in connection_list.values() if isinstance(conn, Connection)]
-    return nicknames
+def init_selector():
+    """ Create new selector. Forked worker process must not share epoll instance with its parent """
+    global selector, timers
+    selector = selectors.DefaultSelector()
+    timers = TimerWheel()
+
+
+def get_inherited_fd():
+    """ Returns listening socket descriptor passed by the server process that is restarting, or None """
+    fd = os.environ.get(LISTEN_FD_ENV)
+    return int(fd) if fd is not None else None
+
+
+def parse_address(argv):
+    """ Returns (addr, port) the server should listen on, based on command line arguments """
+    addr = INADDR_ANY
+    port = DEFAULT_PORT
+
+    if len(argv) == 3:
+        addr = argv[1]
+
+        if addr in ["*", "-", "::", ""]:
+            addr = INADDR_ANY
+        port = argv[2]
+
+        if not is_valid_port(port):
+            server_logger.error(f"Wrong port: {port}")
+            sys.exit(1)
+        port = int(port)
+
+    elif len(argv) == 2:
+        addr = argv[1]
+
+    return addr, port
 
 
 class DontGetAngryServer:
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, game_workers=GAME_WORKERS):
         self.HOST = host
         self.PORT = port
         self.room_manager = RoomManager()
+        self.control_sockets = {}   # sock: handler, non-client sockets watched by the server loop
+        self.admission = AdmissionController()
+        self.room_manager.admission = self.admission
+        self.admission.start(timers)
+        self.game_pool = None
+        if game_workers > 0:
+            self.game_pool = GameWorkerPool(game_workers)
+            Room.game_pool = self.game_pool
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.log_connection_stats)
+        self.successor = None       # process started by restart()
+        self.drain_deadline = None  # set when this process does not accept new connections anymore
+        self.init_restart()
+        self.init_lobby_events()
         self.init_server()
         self.bind_server()
         self.listen_server()
         self.run()
 
     def init_server(self):
-        """ Create server socket. """
+        """ Create server socket or take over the socket of the process that is restarting. """
+        fd = get_inherited_fd()
+        if fd is not None:
+            del os.environ[LISTEN_FD_ENV]
+            self.srv_socket = socket.socket(fileno=fd)
+            self.srv_socket.setblocking(False)
+            server_logger.info(f"Inherited listening socket {self.srv_socket.getsockname()}")
+            return
 
         if self.HOST == "":
             family = socket.AF_INET6
@@ -57,8 +143,10 @@ class DontGetAngryServer:
         server will bind to all ip addresses.
         """
         try:
-            self.srv_socket.bind((self.HOST, self.PORT))
+            if self.srv_socket.getsockname()[1] == 0:     # not inherited bound socket
+                self.srv_socket.bind((self.HOST, self.PORT))
             connection_list[self.srv_socket] = SERVER_FLAG
+            selector.register(self.srv_socket, selectors.EVENT_READ, SERVER_FLAG)
         except OSError as e:
             server_logger.error(f"Bind socket error: {str(e)}")
             self.close_server()
@@ -67,67 +155,290 @@ class DontGetAngryServer:
         self.srv_socket.listen(BACKLOG)
         sockinfo = self.srv_socket.getsockname()
         server_logger.info(f"Listinig on {sockinfo} ...")
+        self.notify_parent()
+
+    def init_restart(self):
+        """
+        SIGHUP restarts the server without dropping connections: new process inherits the listening socket,
+        this one stops accepting when the new one is ready and serves running games until DRAIN_TIMEOUT.
+        Signal handlers only wake up the server loop, restart is done by the loop.
+        """
+        self.restart_r, self.restart_w = socket.socketpair()
+        self.restart_r.setblocking(False)
+        self.restart_w.setblocking(False)
+        self.register_control_socket(self.restart_r, self.handle_restart_event)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.wake_restart(RESTART_REQUESTED))
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.wake_restart(SUCCESSOR_READY))
+
+    def init_lobby_events(self):
+        """ Game workers close rooms in their threads, they wake the server loop up to start the lobby events window """
+        self.events_r, self.events_w = socket.socketpair()
+        self.events_r.setblocking(False)
+        self.events_w.setblocking(False)
+        self.register_control_socket(self.events_r, self.handle_lobby_events)
+        self.room_manager.events.wakeup = self.wake_lobby_events
+
+    def wake_lobby_events(self):
+        try:
+            self.events_w.send(b"\0")
+        except OSError:     # loop has not read previous wakeups yet
+            pass
+
+    def handle_lobby_events(self):
+        try:
+            while self.events_r.recv(RCV_BUFFSIZE):
+                pass
+        except BlockingIOError:
+            pass
+        self.room_manager.start_events_window()
+
+    def wake_restart(self, event):
+        try:
+            self.restart_w.send(event)
+        except OSError:
+            pass
+
+    def handle_restart_event(self):
+        try:
+            events = self.restart_r.recv(RCV_BUFFSIZE)
+        except BlockingIOError:
+            return
+        if RESTART_REQUESTED in events:
+            self.restart()
+        if SUCCESSOR_READY in events:
+            self.drain()
+
+    def restart(self):
+        """ Start new server process that inherits the listening socket """
+        if self.successor is not None or self.drain_deadline is not None:
+            server_logger.warning("Restart already in progress")
+            return
+
+        fd = self.srv_socket.fileno()
+        env = dict(os.environ)
+        env[LISTEN_FD_ENV] = str(fd)
+        env[PARENT_PID_ENV] = str(os.getpid())
+        args = [sys.executable, SERVER_SCRIPT] + sys.argv[1:]
+        try:
+            self.successor = subprocess.Popen(args, env=env, cwd=START_DIR, pass_fds=(fd,), stdin=subprocess.DEVNULL,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            server_logger.error(f"Cannot start new server process: {str(e)}")
+            return
+        server_logger.info(f"Restarting, new server process {self.successor.pid} started")
+        timers.schedule(SUCCESSOR_TIMEOUT, self.check_successor)
+
+    def check_successor(self):
+        """ Timer callback. Keep serving if new process has not started listening """
+        if self.drain_deadline is None and self.successor is not None:
+            server_logger.error(f"New server process is not ready after {SUCCESSOR_TIMEOUT} seconds, restart aborted")
+            self.successor.poll()
+            self.successor = None
+
+    def notify_parent(self):
+        """ Tell the process that is restarting that this one accepts connections now """
+        pid = os.environ.pop(PARENT_PID_ENV, None)
+        if pid is not None:
+            try:
+                os.kill(int(pid), signal.SIGUSR2)
+            except (OSError, ValueError) as e:
+                server_logger.error(f"Cannot notify previous server process {pid}: {str(e)}")
+
+    def drain(self):
+        """ Stop accepting connections and rooms, running games are finished by this process """
+        if self.drain_deadline is not None:
+            return
+        server_logger.info(f"New server process is ready, draining for at most {DRAIN_TIMEOUT} seconds")
+        self.drain_deadline = time.monotonic() + DRAIN_TIMEOUT
+        self.admission.draining = True
+        selector.unregister(self.srv_socket)
+        del connection_list[self.srv_socket]
+        self.srv_socket.close()
+        self.check_drained()
+
+    def check_drained(self):
+        """ Timer callback. Exit when there are no clients left or drain deadline has passed """
+        if self.successor is not None:
+            self.successor.poll()   # reap new process, it detaches as a daemon
+
+        clients = [conn for conn in connection_list.values() if isinstance(conn, Connection)]
+        games = sum(worker.load() for worker in self.game_pool.workers) if self.game_pool is not None else 0
+        if not clients and not games:
+            server_logger.info("All clients left, previous server process exits")
+            self.close_server(0)
+
+        if time.monotonic() < self.drain_deadline:
+            timers.schedule(DRAIN_CHECK_INTERVAL, self.check_drained)
+            return
+
+        server_logger.info(f"Drain deadline passed, disconnecting {len(clients)} clients and {games} games")
+        for conn in clients:
+            try:
+                conn.snd_notification(TLV_INFO_TAG, "Server restarted, please reconnect")
+                conn.flush()    # written now, the loop does not run again to flush its write batch
+            except (OSError, ClearClientException):
+                pass
+        self.close_server()
 
     def run(self):
 
         try:
             while True:
-                # print(connection_list)
-                read_sockets, _, _ = select.select(list(connection_list.keys()), [], [])     # !TODO change to poll()
-                # print("READ SOCKETS: ", read_sockets)
-                for sock in read_sockets:
+                # only sockets that are ready are returned, cost does not depend on number of connections
+                # wake up periodically only if there are clients that can be too slow or timers to run
+                timeout = timers.next_timeout()
+                if congested_connections:
+                    timeout = min(timeout, SLOW_CLIENT_TIMEOUT) if timeout is not None else SLOW_CLIENT_TIMEOUT
+                events = selector.select(timeout)
+                for key, mask in events:
+                    sock = key.fileobj
                     if sock is self.srv_socket:
                         # accept new connection
                         self.accept_connection()
+                    elif sock in self.control_sockets:
+                        self.control_sockets[sock]()
+                    elif sock not in connection_list:
+                        # unsubscribed or disconnected while handling previous event in this batch
+                        continue
                     else:
                         try:
-                            connection_list[sock].handle_msg2()
-                            # print("AFTER HANDLING MSG: ", self.room_manager)
-                            # print("[MSG] From {} : {}".format(str(self.connection_list[sock]), recvText(sock)))
+                            conn = connection_list[sock]
+                            if mask & selectors.EVENT_WRITE:
+                                conn.flush()
+                            if mask & selectors.EVENT_READ:
+                                conn.handle_msg2()
                         except (EOFError, OSError, ClearClientException) as e:
                             server_logger.error(f"Error while handling message: {str(e)}")
+                            if isinstance(e, ClearClientException):
+                                tracing.dump_error(conn.cli.addr, e)
                             self.client_disconnect(sock)
                         except ValueError as e:
                             server_logger.error(f"Unknown tag received")
+                            tracing.dump_error(conn.cli.addr, e)
                         except UnsubscribeException:
                             server_logger.debug(f"Received Clear Client Exception")
                             unsubscribe_client(sock)
 
+                self.disconnect_slow_clients()
+                timers.advance()
+                flush_write_batch(write_batch, self.write_failed)
+
         except KeyboardInterrupt:
             self.close_server()
 
     def client_disconnect(self, sock):
-        server_logger.info(f"Client {connection_list[sock].cli} disconnected")
-        self.room_manager.disconnect_client(connection_list[sock])
-        del connection_list[sock]
-        sock.close()
+        conn = connection_list[sock]
+        server_logger.info(f"Client {conn.cli} disconnected")
+        if conn.game is not None:
+            conn.game.player_disconnected(conn)
+        else:
+            self.room_manager.disconnect_client(conn)
+        conn.close(timeout=0)
+
+    def write_failed(self, conn, e):
+        server_logger.error(f"Error while writing to {repr(conn.cli)}: {str(e)}")
+        if conn.sock in connection_list:
+            self.client_disconnect(conn.sock)
+
+    def disconnect_slow_clients(self):
+        """ Disconnect clients that have not been reading their messages for SLOW_CLIENT_TIMEOUT """
+        for conn in list(congested_connections):
+            if conn.sock not in connection_list:     # handled by a game thread
+                continue
+            try:
+                conn.check_slow()
+            except ClearClientException as e:
+                server_logger.error(f"Slow client {repr(conn.cli)}: {str(e)} {conn.get_send_stats()}")
+                self.client_disconnect(conn.sock)
+
+    def check_idle(self, conn):
+        """ Timer callback. Disconnect lobby client that has not sent anything for LOBBY_IDLE_TIMEOUT """
+        if connection_list.get(conn.sock) is not conn or conn.game is not None:
+            return      # closed, passed away or playing, turn timeouts take care of players
+        idle = time.monotonic() - conn.last_activity
+        if idle < LOBBY_IDLE_TIMEOUT:
+            conn.idle_timer = timers.schedule(LOBBY_IDLE_TIMEOUT - idle, self.check_idle, conn)
+            return
 
-    def close_server(self):
-        """ Close all open sockets """
+        server_logger.info(f"Client {repr(conn.cli)} idle for {int(idle)} seconds")
+        try:
+            conn.snd_notification(TLV_INFO_TAG, "Disconnected after {} seconds of inactivity".format(int(idle)))
+        except (OSError, ClearClientException):
+            pass
+        self.client_disconnect(conn.sock)
+
+    def log_connection_stats(self, signum=None, frame=None):
+        """ Log outbound queue of every connection, game workers load and traced frames. Called on SIGUSR1 """
+        for conn in connection_list.values():
+            if isinstance(conn, Connection):
+                server_logger.info(f"Connection {repr(conn.cli)}: {conn.get_send_stats()}")
+        server_logger.info(f"Admission: {self.admission.stats}, overload: {self.admission.overload}")
+        if self.game_pool is not None:
+            for stats in self.game_pool.get_stats():
+                server_logger.info(f"Game worker: {stats}")
+        if tracing.enabled:
+            tracing.dump("SIGUSR1")
+
+    def close_server(self, status=1):
+        """
+        Close all open sockets and exit.
+        :param status:  (int)   : exit status, 0 after a clean drain of the previous process of a restart
+        """
         server_logger.info("Closing...")
         for sock in connection_list.keys():
             sock.close()
+        for sock in self.control_sockets.keys():
+            sock.close()
+        if self.game_pool is not None:
+            self.game_pool.stop()
+        selector.close()
         # self.srv_socket.close()
-        sys.exit(1)
+        sys.exit(status)
 
     def accept_connection(self):
         """ Accept new connection. Create new Connection and add it to connection list."""
         csock, addr = self.srv_socket.accept()
+        try:
+            self.admission.admit_connection(len(connection_list))
+        except OverloadedException as e:
+            self.reject_connection(csock, addr, str(e))
+            return
         cli = Client(csock, addr)
-        conn = Connection(cli, csock)
-        connection_list[csock] = conn        # change cli -> cli_conn
+        self.add_connection(self.create_connection(cli, csock))
         server_logger.info(f"Connection from: {addr}")
 
-    def send_welcome_msg(self, sock):
-        welcome_msg = "***Welcome to the server!***\n" +\
-                        self.room_manager.get_rooms_description() +\
-                        "\nYou can join or create room within the range 0 .. 9"
-        sendText(sock, welcome_msg)  # TODO handle socket broken
+    def reject_connection(self, csock, addr, reason):
+        """ Tell the client why it cannot be served and close the connection, never blocks """
+        server_logger.warning(f"Connection from {addr} rejected: {reason}")
+        try:
+            csock.setblocking(False)
+            csock.send(frame_tlv(add_tlv_tag(TLV_FAIL_TAG, f"{reason}, try again later")))
+        except OSError:
+            pass
+        csock.close()
+
+    def create_connection(self, cli, csock):
+        return Connection(cli, csock)
+
+    def add_connection(self, conn):
+        """ Start handling messages from the connection in the server loop """
+        conn.sock.setblocking(False)
+        connection_list[conn.sock] = conn        # change cli -> cli_conn
+        conn.attach(selector, timers, write_batch)
+        if LOBBY_IDLE_TIMEOUT > 0:
+            conn.idle_timer = timers.schedule(LOBBY_IDLE_TIMEOUT, self.check_idle, conn)
+
+    def register_control_socket(self, sock, handler):
+        """ Watch non-client socket in the server loop. handler() is called when sock is readable """
+        self.control_sockets[sock] = handler
+        selector.register(sock, selectors.EVENT_READ, handler)
 
 
 def unsubscribe_client(sock):
-    """ Remove sock descriptor from connection list. Select will not be longer waiting for the events on that socket """
-    del connection_list[sock]
+    """ Remove sock descriptor from connection list. Selector will not be longer waiting for the events on that socket """
+    conn = connection_list.pop(sock)
+    conn.detach()
 
 
 class Client:
@@ -160,45 +471,144 @@ class Connection:
         self.cli = cli
         self.sock = cli_sock
         self.room_manager = RoomManager()
+        self.decoder = FrameDecoder()
+        self.decoder.peer = cli.addr
+        self.protocol = PROTOCOL_V1     # framing version, negotiated with nickname
+        self.compressor = None          # FrameCompressor if client accepts compressed messages
+        self.selector = None        # selector that watches the socket (server loop or game)
+        self.events = 0             # events registered in the selector
+        self.outbox = deque()       # memoryview of messages not written to the socket yet
+        self.outbox_size = 0        # bytes in outbox
+        self.bytes_sent = 0
+        self.over_high_water = None     # time since outbox exceeds SND_HIGH_WATER
+        self.close_deadline = None      # connection is closed when outbox is written or deadline passes
+        self.game = None                # GameSession the client plays in
+        self.timers = None              # TimerWheel of the loop that handles the connection
+        self.write_batch = None         # connections the loop writes to at the end of the iteration
+        self.congested = congested_connections  # slow clients swept by the loop that handles the connection
+        self.idle_timer = None
+        self.last_activity = time.monotonic()   # time of the last received message
         self.received_tlv = None
+        self.request_id = None      # id sent with the request being handled, echoed by reply
+        self.has_nickname = False   # cli.name is reserved in nicknames
         self.msg_handlers = {
             TLV_NICKNAME_TAG: self.recv_nickname,
+            TLV_PROTOCOL_TAG: self.recv_protocol,
+            TLV_COMPRESSION_TAG: self.recv_protocol,
+            TLV_REQUEST_ID_TAG: self.recv_request_id,
             TLV_ROOM_TAG: self.recv_room,
             TLV_GET_ROOMS: self.send_room_info,
             TLV_START_MSG: self.recv_start,
             TLV_ROLLDICE_TAG: self.recv_roll,
-            TLV_GET_USERINFO: self.send_userinfo
+            TLV_GET_USERINFO: self.send_userinfo,
+            TLV_QUICKJOIN_TAG: self.recv_quick_join,
+            TLV_LIST_ROOMS_TAG: self.send_room_list,
+            TLV_SUBSCRIBE_TAG: self.recv_subscribe,
         }
 
     def handle_msg2(self):
-        """Reads next TTL message from the socket and saves TTL value that indicate type of message to
-        internal variable. Next it calls handler for every TLL in message in order to handle the messages"""
-        self.received_tlv = recvTlv(self.sock)
+        """Reads bytes available in the socket and handles every complete TTL message"""
+        self.decoder.recv_from(self.sock)
+        self.last_activity = time.monotonic()
+        self.handle_frames()
+
+    def handle_frames(self):
+        """Handles complete messages received so far. Stops if connection is not handled by the server
+        loop anymore (game took it over or client was passed to another worker), new owner reads the rest."""
+        tlv = self.decoder.next_frame()
+        while tlv is not None:
+            if self.game is not None:
+                self.game.handle_msg(self, tlv)
+            else:
+                self.handle_tlv(tlv)
+            if self.sock not in connection_list:
+                return
+            tlv = self.decoder.next_frame()
+
+    def handle_tlv(self, tlv):
+        """Saves TTL value that indicate type of message to internal variable.
+        Next it calls handler for every TLL in message in order to handle the messages"""
+        self.received_tlv = tlv
+        self.request_id = tlv.get(TLV_REQUEST_ID_TAG)
         server_logger.debug(f"Received TTL: {self.received_tlv}")
         msg_types = get_types(self.received_tlv)
-        for type in msg_types:
-            try:
-                self.msg_handlers[type]()
-            except KeyError as e:
-                server_logger.error("Cannot parse {}: {}".format(type, e))
+        try:
+            for type in msg_types:
+                try:
+                    self.msg_handlers[type]()
+                except KeyError as e:
+                    server_logger.error("Cannot parse {}: {}".format(type, e))
+        finally:
+            self.request_id = None
 
     def recv_nickname(self):
         """Receive nickname from client, raise OSError if error occurs"""
-        nickname = remove_tlv_padding(self.received_tlv[TLV_NICKNAME_TAG])
-        if nickname in get_all_nicknames():
+        nickname = self.received_tlv[TLV_NICKNAME_TAG]
+        previous = self.cli.name if self.has_nickname else None
+        if not nicknames.reserve(nickname, self, previous):
             server_logger.debug(f"Nickname already exists: {nickname}")
-            self.snd_notification(TLV_FAIL_TAG, "Nickname already exists")
+            self.reply({TLV_FAIL_TAG: "Nickname already exists"})
             return
 
         server_logger.debug(f"Nickname received: {nickname}")
         self.cli.set_nickname(nickname)
-        self.snd_notification(TLV_OK_TAG, self.get_welcome_message())
+        self.has_nickname = True
+        if previous is not None and TLV_PROTOCOL_TAG not in self.received_tlv:
+            # rename, client keeps the framing it uses
+            self.reply({TLV_OK_TAG: self.get_welcome_message()})
+            return
+        protocol = self.negotiate_protocol()
+        compression = self.negotiate_compression(protocol)
+        answer = {TLV_OK_TAG: self.get_welcome_message()}
+        if protocol != PROTOCOL_V1:
+            answer[TLV_PROTOCOL_TAG] = str(protocol)
+        if compression:
+            answer[TLV_COMPRESSION_TAG] = COMPRESSION_ZLIB
+        # answer is sent with the old framing, client switches after reading it
+        self.reply(answer)
+        self.set_protocol(protocol, compression)
+
+    def negotiate_protocol(self):
+        """ Returns the highest framing version supported by both sides. Clients that do not send
+        the version are old ones and use v1. """
+        try:
+            requested = int(self.received_tlv.get(TLV_PROTOCOL_TAG, PROTOCOL_V1))
+        except ValueError:
+            requested = PROTOCOL_V1
+        return max(PROTOCOL_V1, min(requested, PROTOCOL_VERSION))
+
+    def negotiate_compression(self, protocol):
+        """ Returns True if messages to the client will be compressed. Compressed frames need protocol v2. """
+        requested = self.received_tlv.get(TLV_COMPRESSION_TAG, "")
+        return COMPRESSION and protocol >= PROTOCOL_V2 and COMPRESSION_ZLIB in deserialize_list(requested)
+
+    def recv_protocol(self):
+        """ Framing version and compression are negotiated together with nickname, see recv_nickname """
+        pass
+
+    def recv_request_id(self):
+        """ Request id is not a request, it is echoed in the reply, see reply """
+        pass
+
+    def set_protocol(self, protocol, compression=False):
+        """ Use framing version for all next messages in both directions, compress messages to the client """
+        if protocol != self.protocol:
+            server_logger.debug(f"{self.cli.name} switched to protocol v{protocol}, compression: {compression}")
+        self.protocol = protocol
+        self.decoder.protocol = protocol
+        self.compressor = FrameCompressor() if compression else None
 
     def recv_room(self):
         """
         Try to join or create an room. Returns msg that should be send to the client.
         """
-        rnum = remove_tlv_padding(self.received_tlv[TLV_ROOM_TAG])
+        rnum = self.parse_room_number()
+        if rnum is not None:
+            self.join_room(rnum)
+
+    def parse_room_number(self):
+        """ Returns received room number or None (and notifies the client) if it is not valid """
+        rnum = self.received_tlv[TLV_ROOM_TAG]
         # check if number is an integer greater than 0
         try:
             rnum = int(rnum)
@@ -206,13 +616,35 @@ class Connection:
                 raise ValueError()
         except ValueError:
             server_logger.warning("Wrong room number: {}".format(rnum))
-            self.snd_notification(TLV_FAIL_TAG, "You can join/create a room only with positive number!")
+            self.reply({TLV_FAIL_TAG: "You can join/create a room only with positive number!"})
+            return None
+        return rnum
+
+    def join_room(self, rnum):
+        try:
+            joined = self.room_manager.join_client(self, rnum)
+        except OverloadedException as e:
+            server_logger.warning(f"Room {rnum} not created for {repr(self.cli)}: {str(e)}")
+            self.reply({TLV_FAIL_TAG: "Cannot create room {}: {}, try again later".format(rnum, str(e))})
             return
 
-        if self.room_manager.join_client(self, rnum):
-            self.snd_notification(TLV_OK_TAG, "You have joined room {}".format(rnum))
+        if joined:
+            self.reply({TLV_OK_TAG: "You have joined room {}".format(rnum)})
         else:
-            self.snd_notification(TLV_FAIL_TAG, "Error while joining the room {}".format(rnum))
+            self.reply({TLV_FAIL_TAG: "Error while joining the room {}".format(rnum)})
+
+    def recv_quick_join(self):
+        """ Join a room chosen by the server. If there is no free seat, the answer is sent once there is one """
+        if not self.room_manager.quick_join(self, self.request_id):
+            server_logger.debug(f"{repr(self.cli)} waits for quick-join")
+
+    def quick_joined(self, rnum, request_id):
+        """ Answer quick-join request, called when the client is seated, possibly after the request was handled """
+        handled_request, self.request_id = self.request_id, request_id
+        try:
+            self.reply({TLV_OK_TAG: "You have joined room {}".format(rnum), TLV_ROOM_TAG: str(rnum)})
+        finally:
+            self.request_id = handled_request
 
     def recv_msg(self):
         """ Receive text message from a client """
@@ -225,17 +657,12 @@ class Connection:
 
     def recv_start(self):
         room = self.room_manager.rooms[self.cli.rnum]
-        if not room.start_game():
+        if not self.room_manager.start_game(room):
             self.snd_notification(TLV_INFO_TAG, "\nCannot start a game\n")
-            return
-
-        for conn in room.room_members:
-            server_logger.info(f"Client {repr(conn.cli)} unsubscribed")
-            unsubscribe_client(conn.sock)
 
     def recv_roll(self):    # !TODO connection reset handling
         """Can raise ValueError"""
-        roll = remove_tlv_padding(self.received_tlv[TLV_ROLLDICE_TAG])
+        roll = self.received_tlv[TLV_ROLLDICE_TAG]
         return int(roll)
 
     def snd_ack_notification(self, flag, msg=""):       # handle OSError on higher level!
@@ -246,13 +673,13 @@ class Connection:
         }
 
         tlv = build_tlv_with_tags(data_dict)
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
 
     def snd_ack_dict_notification(self, data_dict):
         """ Send message with tags included in data_dict with positive ack """
         data_dict[TLV_OK_TAG] = "ok"
         tlv = build_tlv_with_tags(data_dict)
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
 
     def snd_notification(self, flag, msg=""):       # handle OSError on higher level!
         """
@@ -261,39 +688,237 @@ class Connection:
         @param msg:     (str)   : value of the tlv header
         """
         tlv = add_tlv_tag(flag, msg)
-        sendTlv(self.sock, tlv)
+        self.send_tlv(tlv)
 
     def send_room_info(self):
-        tlv = add_tlv_tag(TLV_INFO_TAG, self.room_manager.get_rooms_description())
-        sendTlv(self.sock, tlv)
+        self.reply_tlv(self.room_manager.get_rooms_info(self.protocol))
+
+    def send_room_list(self):
+        """ Send one page of the room listing, options of the request are described in room_listing.py """
+        try:
+            page_args = parse_options(deserialize_list(self.received_tlv[TLV_LIST_ROOMS_TAG]))
+        except ValueError as e:
+            self.reply({TLV_FAIL_TAG: "Wrong room listing request: {}".format(str(e))})
+            return
+        entries, cursor = self.room_manager.list_rooms(self.protocol, **page_args)
+        answer = {TLV_LIST_ROOMS_TAG: entries}
+        if cursor is not None:
+            answer[TLV_CURSOR_TAG] = cursor
+        self.reply(answer)
+
+    def recv_subscribe(self):
+        """ Start or stop pushing lobby events to the client """
+        if self.received_tlv[TLV_SUBSCRIBE_TAG] == "0":
+            self.room_manager.unsubscribe(self)
+            self.reply({TLV_OK_TAG: "Unsubscribed from lobby events"})
+        else:
+            self.room_manager.subscribe(self, self.timers)
+            self.reply({TLV_OK_TAG: "Subscribed to lobby events"})
 
     def send_userinfo(self):
-        tlv = add_tlv_tag(TLV_INFO_TAG, str(self.cli))
-        sendTlv(self.sock, tlv)
+        self.reply({TLV_INFO_TAG: str(self.cli)})
 
-    def get_welcome_message(self):
-        msg = "\n****Welcome, you have connected to the server****\n" + self.room_manager.get_rooms_description()
-        return msg
+    def reply(self, data_dict):
+        """
+        Send answer to the request being handled. Request id sent by the client is echoed, so the client
+        can send several requests without waiting and match the answers (pipelining).
+        @param data_dict:   (dict)  : tag: value of the answer
+        """
+        if self.request_id is not None:
+            data_dict[TLV_REQUEST_ID_TAG] = self.request_id
+        self.send_tlv(build_tlv_with_tags(data_dict))
+
+    def reply_tlv(self, tlv):
+        """ Send prepared message as the answer, e.g. one shared by many clients. Request id is appended to its frames """
+        if self.request_id is not None:
+            tlv = tlv.extend({TLV_REQUEST_ID_TAG: self.request_id})
+        self.send_tlv(tlv)
+
+    def send_tlv(self, tlv):
+        """ Send TLV message to the client. Raise OSError if socket is broken """
+        try:
+            frame = frame_tlv(tlv, self.protocol)
+        except ValueError as e:     # too long for the framing, the client would drop the connection
+            server_logger.error("Message to {} not sent: {}".format(repr(self.cli), str(e)))
+            return
+        if tracing.enabled:
+            tracing.record(tracing.SENT, self.cli.addr, self.protocol, frame)
+        if self.compressor is not None and len(frame) >= COMPRESSION_THRESHOLD:
+            frame = self.compressor.compress_frame(frame)
+        self.send_frame(frame)
 
+    def send_frame(self, frame):
+        """
+        Queue encoded message and write as much as the socket takes without blocking. The rest is written
+        when socket becomes writable. Raise ClearClientException if client does not read its messages.
+        """
+        self.outbox.append(memoryview(frame))
+        self.outbox_size += len(frame)
+        if self.write_batch is not None and WRITE_COALESCING:
+            self.write_batch.add(self)      # written with other messages queued in this loop iteration
+        else:
+            self.flush()
 
-if __name__ == "__main__":
-    addr = INADDR_ANY
-    port = DEFAULT_PORT
+    def flush(self):
+        """ Write queued messages until socket buffer is full. Raise OSError if socket is broken.
+        Several queued messages are written with one sendmsg call (scatter/gather) where it is available. """
+        while self.outbox:
+            try:
+                if len(self.outbox) == 1 or not HAS_SENDMSG:
+                    sent = self.sock.send(self.outbox[0])
+                else:
+                    sent = self.sock.sendmsg(list(islice(self.outbox, SEND_IOV_MAX)))
+            except BlockingIOError:
+                break
+            self.bytes_sent += sent
+            self.outbox_size -= sent
+            if not self.consume(sent):
+                break
+
+        if self.close_deadline is not None and not self.outbox:
+            self.close(timeout=0)
+            return
+        self.update_events()
+        self.check_slow()
+
+    def consume(self, sent):
+        """ Drop written bytes from the outbox. Returns False if a message has been written partially """
+        while sent:
+            head = self.outbox[0]
+            if sent < len(head):
+                self.outbox[0] = head[sent:]
+                return False
+            sent -= len(head)
+            self.outbox.popleft()
+        return True
+
+    def update_events(self):
+        """ Wait for writability only while there are queued messages, stop reading once connection is closing """
+        events = selectors.EVENT_READ if self.close_deadline is None else 0
+        events |= selectors.EVENT_WRITE if self.outbox else 0
+        if self.selector is not None and events != self.events:
+            self.selector.modify(self.sock, events, self)
+            self.events = events
+
+    def queued_bytes(self):
+        return self.outbox_size
+
+    def check_slow(self):
+        """ Raise ClearClientException if more than SND_HIGH_WATER bytes have been queued for too long """
+        if self.close_deadline is not None:
+            if time.monotonic() > self.close_deadline:
+                raise ClearClientException("Queued messages not written before close")
+            return
 
-    if len(sys.argv) == 3:
-        addr = sys.argv[1]
+        if self.queued_bytes() <= SND_HIGH_WATER:
+            self.over_high_water = None
+            self.congested.discard(self)
+            return
 
-        if addr in ["*", "-", "::", ""]:
-            addr = INADDR_ANY
-        port = sys.argv[2]
+        now = time.monotonic()
+        if self.over_high_water is None:
+            self.over_high_water = now
+            self.congested.add(self)
+        elif now - self.over_high_water > SLOW_CLIENT_TIMEOUT:
+            raise ClearClientException("Client does not read messages, {} bytes queued".format(self.queued_bytes()))
 
-        if not is_valid_port(port):
-            server_logger.error(f"Wrong port: {port}")
-            sys.exit(1)
-        port = int(port)
+    def get_send_stats(self):
+        """
+        Returns outbound queue state:
+        queued_msgs, queued_bytes - messages waiting in the outbox,
+        in_flight - bytes in the kernel send buffer, not acknowledged by the client yet,
+        bytes_sent - total bytes written to the socket
+        """
+        in_flight = None
+        if SIOCOUTQ is not None:
+            try:
+                in_flight = struct.unpack("i", fcntl.ioctl(self.sock.fileno(), SIOCOUTQ, struct.pack("i", 0)))[0]
+            except OSError:
+                pass
+        return {
+            "queued_msgs": len(self.outbox),
+            "queued_bytes": self.queued_bytes(),
+            "in_flight": in_flight,
+            "bytes_sent": self.bytes_sent,
+        }
+
+    def attach(self, selector, timers=None, write_batch=None, congested=None):
+        """
+        Start watching the socket with selector, its events are handled by the owner of the selector.
+        Slow client checks go to congested, set of the owner (congested_connections of the lobby by default).
+        """
+        self.selector = selector
+        self.timers = timers
+        self.write_batch = write_batch
+        self.congested = congested if congested is not None else congested_connections
+        if self.over_high_water is not None or self.close_deadline is not None:
+            self.congested.add(self)
+        self.events = selectors.EVENT_READ | (selectors.EVENT_WRITE if self.outbox else 0)
+        selector.register(self.sock, self.events, self)
+
+    def detach(self):
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+            self.idle_timer = None
+        if self.write_batch is not None:
+            # messages not written yet are written by the next owner or when the connection is closed
+            self.write_batch.discard(self)
+            self.write_batch = None
+        self.congested.discard(self)
+        if self.selector is not None:
+            self.selector.unregister(self.sock)
+            self.selector = None
+            self.timers = None
+
+    def unsubscribe(self):
+        """ Stop handling messages from this client in the server loop, e.g. game takes over the connection """
+        server_logger.info(f"Client {repr(self.cli)} unsubscribed")
+        unsubscribe_client(self.sock)
+
+    def close(self, timeout=CLOSE_FLUSH_TIMEOUT):
+        """
+        Write queued messages, waiting at most timeout seconds, and close the socket.
+        If a loop drives the connection, it is closed by the loop once the outbox is written, nothing blocks.
+        """
+        if self.outbox and self.selector is not None and timeout > 0:
+            self.close_deadline = time.monotonic() + timeout
+            self.congested.add(self)    # deadline is checked by the slow clients sweep
+            self.update_events()
+            return
+
+        connection_list.pop(self.sock, None)
+        self.detach()
+        self.release_nickname()
+        try:
+            if self.outbox:
+                self.sock.settimeout(timeout)
+                for chunk in self.outbox:
+                    self.sock.sendall(chunk)
+        except OSError:
+            pass
+        finally:
+            self.sock.close()
+
+    def release_nickname(self):
+        """ Let other clients use the nickname, connection is closed or passed to another process """
+        if self.has_nickname:
+            nicknames.release(self.cli.name, self)
+            self.has_nickname = False
+
+    def get_welcome_message(self):
+        # sent with the framing used before the answer to the nickname
+        msg = "\n****Welcome, you have connected to the server****\n" + \
+              self.room_manager.get_rooms_description(self.protocol)
+        return msg
+
+
+if __name__ == "__main__":
+    addr, port = parse_address(sys.argv)
 
-    elif len(sys.argv) == 2:
-        addr = sys.argv[1]
+    files_preserve = [server_fh, game_fh, network_fh]
+    if get_inherited_fd() is not None:     # started by restart of the previous server process
+        files_preserve.append(get_inherited_fd())
 
-    with daemon.DaemonContext(files_preserve=[server_fh, game_fh, network_fh]):
+    with daemon.DaemonContext(files_preserve=files_preserve):
+        init_selector()     # daemon closes descriptors opened before, epoll instance included
         serverDGA = DontGetAngryServer(addr, port)
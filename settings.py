@@ -1,20 +1,84 @@
+import os
+from config import load_overrides
+
 # [SERVER SETTINGS]
 RCV_BUFFSIZE = 1024
 SND_BUFFSIZE = 1024
+SND_HIGH_WATER = 65536      # bytes queued for a client that does not read its messages
+SLOW_CLIENT_TIMEOUT = 10    # seconds above SND_HIGH_WATER before the client is disconnected
+CLOSE_FLUSH_TIMEOUT = 1     # seconds to write queued messages when connection is closed
 
 BACKLOG = 10
 MAX_ROOMS = 10
 MAX_CLIENTS_PER_ROOM = 2
+MAX_CONNECTIONS = 10000     # clients connected to one server process
 SERVER_FLAG = 1
 
+GAME_WORKERS = 0        # threads hosting games, 0 runs games on the lobby loop
+GAME_WORKER_TICK = 1    # seconds between game worker housekeeping (slow clients, stats)
+
 DEFAULT_PORT = 65432
 INADDR_ANY = ""
 
 TYPE_LEN = 8
 LENGTH_LEN = 10
+SEND_IOV_MAX = 64       # queued messages written with one sendmsg call
+WRITE_COALESCING = True     # messages for a client are written once per loop iteration, not one by one
+PROTOCOL_VERSION = 2    # highest framing version offered in the nickname handshake, 1 disables binary framing
+BOARD_FIELDS = 24       # fields of the game board
+V1_BOARD_FIELDS_MAX = 40    # games with a protocol v1 player, the text board must fit into one v1 value
+COMPRESSION = True      # accept zlib compression of server messages offered by protocol v2 clients
+COMPRESSION_THRESHOLD = 256     # frames shorter than this (bytes) are sent uncompressed
+COMPRESSION_LEVEL = 6
+MAX_MSG_LEN = 65536     # longer message means broken or malicious client
+TRACE_FRAMES = False    # keep the last frames in memory, written to network log on SIGUSR1 or protocol error
+TRACE_BUFFER_SIZE = 1024    # frames kept by the trace
 
 PADDING_CHAR = "$"
 LIST_DELIMITER = "^"
 
 CONNECT_TIMEOUT = 5
 
+# [TIMERS]
+TIMER_TICK = 0.25           # seconds, precision of the timeouts below
+TIMER_WHEEL_SLOTS = 512
+TURN_TIMEOUT = 60           # seconds for a player to finish the turn, 0 waits forever
+TURN_TIMEOUT_ACTION = "move"    # "move" rolls and moves for the player, "skip" passes the turn
+LOBBY_IDLE_TIMEOUT = 600    # seconds without a message before lobby client is disconnected, 0 disables
+MATCHMAKING_RETRY_INTERVAL = 1  # seconds between checks for free seats while quick-join clients wait
+ROOM_LIST_PAGE_SIZE = 20    # rooms in one page of the room listing if the client does not ask for a size
+ROOM_LIST_PAGE_MAX = 100    # largest page a client can ask for
+LOBBY_EVENT_WINDOW = 0.25   # seconds, room changes within it are sent to lobby subscribers as one message
+
+# [SHARDED SERVER SETTINGS]
+HANDOFF_SOCKET_DIR = "/tmp"     # unix sockets used to pass client connections between workers
+HANDOFF_BUFFSIZE = 2 * MAX_MSG_LEN     # client state, received messages not handled yet included (base64)
+
+
+# [RESTART SETTINGS]
+DRAIN_TIMEOUT = 600         # seconds the old process serves running games after restart (SIGHUP)
+DRAIN_CHECK_INTERVAL = 1    # seconds between checks if the old process can exit
+SUCCESSOR_TIMEOUT = 30      # seconds to wait for the new process to start listening
+LISTEN_FD_ENV = "DGA_LISTEN_FD"     # environment variables passed to the new process
+PARENT_PID_ENV = "DGA_PARENT_PID"
+
+# [ADMISSION CONTROL]
+# new connections and rooms are rejected while any of the limits is exceeded, 0 disables a limit
+ADMISSION_MAX_CPU = 90          # percent of one core used by the server process
+ADMISSION_MAX_MEMORY = 1024     # MB of resident memory
+ADMISSION_MAX_LOOP_LAG = 1.0    # seconds the server loop is late, precision is TIMER_TICK
+ADMISSION_SAMPLE_INTERVAL = 1   # seconds between measurements
+
+# [CONFIGURATION]
+# settings below can be changed in [server] section of CONFIG_FILE or by DGA_<NAME> environment variables
+CONFIG_FILE = os.environ.get("DGA_CONFIG", "dga.ini")
+CONFIGURABLE = (
+    "BACKLOG", "MAX_ROOMS", "MAX_CLIENTS_PER_ROOM", "MAX_CONNECTIONS", "GAME_WORKERS",
+    "SND_HIGH_WATER", "SLOW_CLIENT_TIMEOUT", "TURN_TIMEOUT", "TURN_TIMEOUT_ACTION", "LOBBY_IDLE_TIMEOUT",
+    "MATCHMAKING_RETRY_INTERVAL", "ROOM_LIST_PAGE_SIZE", "ROOM_LIST_PAGE_MAX",
+    "LOBBY_EVENT_WINDOW",
+    "DRAIN_TIMEOUT", "PROTOCOL_VERSION", "WRITE_COALESCING", "BOARD_FIELDS",
+    "COMPRESSION", "COMPRESSION_THRESHOLD", "COMPRESSION_LEVEL", "TRACE_FRAMES", "TRACE_BUFFER_SIZE",
+    "ADMISSION_MAX_CPU", "ADMISSION_MAX_MEMORY", "ADMISSION_MAX_LOOP_LAG", "ADMISSION_SAMPLE_INTERVAL",
+)
+globals().update(load_overrides(globals(), CONFIGURABLE, CONFIG_FILE))
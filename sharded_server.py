@@ -0,0 +1,226 @@
+import array
+import base64
+import json
+import os
+import signal
+import socket
+import sys
+from common import *
+from settings import *
+from exceptions import *
+from rooms import RoomManager
+from server import DontGetAngryServer, Client, Connection, parse_address, init_selector, unsubscribe_client, nicknames
+from game.logger_conf import server_logger, server_fh, game_fh, network_fh
+import daemon
+
+
+def get_handoff_path(port, shard_id):
+    return os.path.join(HANDOFF_SOCKET_DIR, f"dga-{port}-{shard_id}.sock")
+
+
+class ShardCoordinator:
+    """
+    Routes clients between worker processes. Every worker owns subset of room numbers
+    (see RoomManager.get_room_owner). Client that wants to join a room owned by another worker
+    is passed to that worker: socket descriptor and client state are sent over unix datagram socket.
+    """
+
+    def __init__(self, port, shard_id, nshards):
+        self.shard_id = shard_id
+        self.paths = [get_handoff_path(port, i) for i in range(nshards)]
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            os.unlink(self.paths[shard_id])     # left by previous run
+        except FileNotFoundError:
+            pass
+        self.sock.bind(self.paths[shard_id])
+        self.sock.setblocking(False)
+
+    def handoff(self, conn, rnum, owner):
+        """
+        Send client connection to the worker that owns room rnum. Raise OSError if worker is not available.
+        Socket is duplicated to the receiving process, caller should close its copy.
+        """
+        if conn.outbox:
+            raise OSError("Connection has messages that have not been sent yet")
+
+        state = {
+            "name": conn.cli.name,
+            "addr": conn.cli.addr,
+            "rnum": rnum,
+            "protocol": conn.protocol,
+            "compression": conn.compressor is not None,    # new process starts a new zlib stream
+            "request_id": conn.request_id,      # of the join request, answered by the new worker
+            # messages sent after the join request
+            "pending": base64.b64encode(conn.decoder.pending()).decode("ascii"),
+        }
+        msg = json.dumps(state).encode("utf-8")
+        if len(msg) > HANDOFF_BUFFSIZE:
+            raise OSError("Client state of {} bytes does not fit into handoff message".format(len(msg)))
+        fds = array.array("i", [conn.sock.fileno()])
+        self.sock.sendmsg([msg], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)], 0, self.paths[owner])
+        server_logger.info(f"Client {repr(conn.cli)} passed to worker {owner}")
+
+    def receive(self):
+        """
+        Returns (state, fd) of the client passed by another worker. Raise OSError or ValueError if the message
+        is broken, received descriptors are closed then (client is disconnected, it does not wait forever).
+        """
+        msg, fds, flags, _ = socket.recv_fds(self.sock, HANDOFF_BUFFSIZE, 1)
+        try:
+            if not fds:
+                raise OSError("Handoff message without socket descriptor")
+            if flags & (socket.MSG_TRUNC | socket.MSG_CTRUNC):
+                raise OSError("Handoff message truncated")
+            state = json.loads(msg.decode("utf-8"))
+            missing = {"name", "addr", "rnum"} - state.keys() if isinstance(state, dict) else {"client state"}
+            if missing:
+                raise ValueError("Handoff message without {}".format(", ".join(sorted(missing))))
+            state["pending"] = base64.b64decode(state.get("pending", ""), validate=True)
+        except (OSError, ValueError):
+            for fd in fds:
+                os.close(fd)
+            raise
+        return state, fds[0]
+
+    def close(self):
+        self.sock.close()
+        try:
+            os.unlink(self.paths[self.shard_id])
+        except FileNotFoundError:
+            pass
+
+
+class ShardedDontGetAngryServer(DontGetAngryServer):
+    """ Worker process of the sharded server. All workers listen on the same port (SO_REUSEPORT). """
+
+    def __init__(self, host, port, shard_id, nshards):
+        self.shard_id = shard_id
+        self.coordinator = ShardCoordinator(port, shard_id, nshards)
+        RoomManager().configure_shard(shard_id, nshards)
+        super().__init__(host, port)
+
+    def init_restart(self):
+        pass    # workers share the port with SO_REUSEPORT, restart them one by one instead
+
+    def init_server(self):
+        super().init_server()
+        self.srv_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.register_control_socket(self.coordinator.sock, self.adopt_connection)
+
+    def listen_server(self):
+        super().listen_server()
+        server_logger.info(f"Worker {self.shard_id} ready")
+
+    def create_connection(self, cli, csock):
+        return ShardConnection(cli, csock, self.coordinator)
+
+    def adopt_connection(self):
+        """ Take over client passed by another worker and join it to the requested room """
+        try:
+            state, fd = self.coordinator.receive()
+        except (OSError, ValueError) as e:
+            server_logger.error(f"Handoff error: {str(e)}")
+            return
+
+        csock = socket.socket(fileno=fd)
+        cli = Client(csock, tuple(state["addr"]))
+        cli.set_nickname(state["name"])
+        conn = self.create_connection(cli, csock)
+        # nicknames are unique per worker, the client may meet the same nickname here
+        conn.has_nickname = nicknames.reserve(cli.name, conn)
+        if not conn.has_nickname:
+            server_logger.warning(f"Adopted client {repr(cli)} uses nickname of another client of worker {self.shard_id}")
+        self.add_connection(conn)
+        server_logger.info(f"Client {repr(cli)} adopted by worker {self.shard_id}")
+
+        conn.set_protocol(state.get("protocol", PROTOCOL_V1), state.get("compression", False))
+        conn.decoder.feed(state["pending"])
+
+        try:
+            conn.request_id = state.get("request_id")
+            conn.join_room(state["rnum"])
+            conn.request_id = None
+            conn.handle_frames()
+        except (EOFError, OSError, ClearClientException) as e:
+            server_logger.error(f"Error while joining adopted client: {str(e)}")
+            self.client_disconnect(csock)
+
+    def close_server(self, status=1):
+        self.coordinator.close()
+        super().close_server(status)
+
+
+class ShardConnection(Connection):
+
+    def __init__(self, cli, cli_sock, coordinator):
+        super().__init__(cli, cli_sock)
+        self.coordinator = coordinator
+
+    def recv_room(self):
+        rnum = self.parse_room_number()
+        if rnum is None:
+            return
+
+        owner = self.room_manager.get_room_owner(rnum)
+        if owner == self.room_manager.shard_id:
+            self.join_room(rnum)
+            return
+
+        try:
+            self.flush()    # answers to requests sent before the join request (pipelining)
+            self.coordinator.handoff(self, rnum, owner)
+        except OSError as e:
+            server_logger.error(f"Cannot pass client to worker {owner}: {str(e)}")
+            self.reply({TLV_FAIL_TAG: "Room {} is not available now".format(rnum)})
+            return
+
+        # connection belongs to the other worker now, forget it without closing the client
+        self.room_manager.disconnect_client(self)
+        self.release_nickname()
+        unsubscribe_client(self.sock)
+        self.sock.close()
+
+
+def run_worker(addr, port, shard_id, nshards):
+    init_selector()
+    try:
+        ShardedDontGetAngryServer(addr, port, shard_id, nshards)
+    finally:
+        os._exit(0)
+
+
+def launch(addr, port, nworkers):
+    """ Fork nworkers worker processes and wait until all of them exit """
+    workers = []
+    for shard_id in range(nworkers):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(addr, port, shard_id, nworkers)
+        workers.append(pid)
+    server_logger.info(f"Started {nworkers} workers: {workers}")
+
+    def stop_workers(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGINT)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for pid in workers:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop_workers(signal.SIGINT, None)
+
+
+if __name__ == "__main__":
+    # python3 sharded_server.py [address] [port] [workers]
+    nworkers = os.cpu_count()
+    if len(sys.argv) == 4:
+        nworkers = int(sys.argv[3])
+    addr, port = parse_address(sys.argv[:3])
+
+    with daemon.DaemonContext(files_preserve=[server_fh, game_fh, network_fh]):
+        launch(addr, port, nworkers)
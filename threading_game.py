@@ -1,18 +1,36 @@
+import socket
 import threading
-import select
+import selectors
+import time
+from collections import deque
 from settings import *
 from common import *
+from exceptions import ClearClientException
+from timers import TimerWheel
+import tracing
 from game.game import Game
+from game.board_state import get_positions, snapshot_entries, delta_entries
 from game.logger_conf import logger, reveal_name, game_logger
 
 
 NROLLS = 3
 
+# GameSession states
+WAIT_ROLL = "WAIT_ROLL"         # current player should roll a dice
+WAIT_CHOICE = "WAIT_CHOICE"     # current player should place or move a figure
+FINISHED = "FINISHED"
+STATE_TAGS = {      # messages of the current player handled in the state
+    WAIT_ROLL: (TLV_ROLLDICE_TAG,),
+    WAIT_CHOICE: (TLV_PLACEFIGURE_TAG, TLV_MOVEFIGURE_TAG),
+}
 
-class GameThread(threading.Thread):
+
+class BaseGame:
+    """
+    Game logic shared by all the game runners. Runner decides how messages are awaited.
+    """
 
     def __init__(self, connections, rnum):
-        threading.Thread.__init__(self)
         self.connections = connections      # clients Connection
         self.rnum = rnum     # we need it to close the room
         self.nplayers = len(connections)
@@ -28,6 +46,7 @@ class GameThread(threading.Thread):
         self.place_figure = None
         self.move_figure = None
         self.roll = None
+        self.roll_options = {}      # options sent to the current player with the roll result
 
         self.next_player = 0
         self.current_player = None
@@ -41,89 +60,47 @@ class GameThread(threading.Thread):
             index += 1
 
         game_logger.debug("player_names: {}".format(player_names))
-        self.game = Game(player_names, 24) #Board should scale but will not, because it is not important :)
+        self.game = Game(player_names, self.get_board_fields())
+        self.board_positions = {}   # positions of the figures sent to the players in the last board message
         # print(self.game.game_board.display_board())
 
-    def run(self):
-        try:
-            self.running = True
-            self.snd_msg_to_all(self.get_game_status())
-            self.game.start_game()
-            # self.create()
-            while self.running:
-                for player in self.game.players:
-                    self.clear_before_turn()
-                    self.current_player = player
-                    self.send_new_turn_started(player.name)
-                    self.game.start_player_turn(player)
-                    self.snd_player_status(player)
-
-                    roll = self.wait_dice_message()
-                    # refactoring
-                    if self.skip_turn:  # player cannot move
-                        continue
-                    # -----------------
-                    logger.info("Player {} rolled {}".format(self.current_player.name, roll))
-                    player_wants_place_figure = self.wait_want_place_figure()
-                    if player_wants_place_figure:
-                        logger.info("Player {} chose to PLACE figure: {}".format(self.current_player.name, self.place_figure))
-                    else:
-                        logger.info("Player {} chose to MOVE figure: {}".format(self.current_player.name, self.move_figure))
-
-                    # if player.has_figures_on_board(self.game.game_board):
-                    # print("Player {} has figures on board".format(player.name))
-                    if roll == 6 and len(player.start_figures) != 0:
-                        if player_wants_place_figure:
-                            game_logger.debug("Player {} wants to place new figure".format(player.name))
-                            player.place_figure(self.game.game_board)
-                        else:
-                            game_logger.debug("Player {} wants to move figure {}".format(player.name, self.move_figure))
-                            player.move_figure(self.game.game_board, roll, self.move_figure)
-                    else:
-                        game_logger.debug("Player {} wants to move figure {}".format(player.name, self.move_figure))
-                        player.move_figure(self.game.game_board, roll, self.move_figure)
-                            
-                    if self.game.is_player_winner(player):
-                        game_logger.info("Player {} won the game after {} turns!".format(player.name, player.turns))
-                        self.snd_msg_to_all(f"Game ended.\nPlayer {player.name} won after {player.turns} turns.\n")
-                        self.close_all()
-                        self.running = False
-
-                    game_logger.debug("Player data after turn: start figures: {}, finished figures: {}".format(
-                        reveal_name(player.start_figures), reveal_name(player.finished_figures)))
-                # debug output of board fields
-                game_logger.debug("Board fields after turn: {}".format(reveal_name(self.game.game_board.fields)))
-
-        except (EOFError, OSError) as e:
-            game_logger.error("[ERROR-GAME] Error while handling message: ", str(e))
+    def begin_turn(self, player):
+        """ Reset turn state and notify players that new turn has started """
+        self.clear_before_turn()
+        self.current_player = player
+        self.send_new_turn_started(player.name)
+        self.game.start_player_turn(player)
+        self.snd_player_status(player)
+
+    def end_turn(self, player, roll, player_wants_place_figure):
+        """ Apply player's choice to the board. Close the game if player has won """
+        logger.info("Player {} rolled {}".format(self.current_player.name, roll))
+        if player_wants_place_figure:
+            logger.info("Player {} chose to PLACE figure: {}".format(self.current_player.name, self.place_figure))
+        else:
+            logger.info("Player {} chose to MOVE figure: {}".format(self.current_player.name, self.move_figure))
+
+        if roll == 6 and len(player.start_figures) != 0:
+            if player_wants_place_figure:
+                game_logger.debug("Player {} wants to place new figure".format(player.name))
+                player.place_figure(self.game.game_board)
+            else:
+                game_logger.debug("Player {} wants to move figure {}".format(player.name, self.move_figure))
+                player.move_figure(self.game.game_board, roll, self.move_figure)
+        else:
+            game_logger.debug("Player {} wants to move figure {}".format(player.name, self.move_figure))
+            player.move_figure(self.game.game_board, roll, self.move_figure)
+
+        self.send_board_delta()
+
+        if self.game.is_player_winner(player):
+            game_logger.info("Player {} won the game after {} turns!".format(player.name, player.turns))
+            self.snd_msg_to_all(f"Game ended.\nPlayer {player.name} won after {player.turns} turns.\n")
             self.close_all()
-            return
-        except ValueError as e:
-            game_logger.error("[ERROR] Unknown tag received: {}".format(e))
-
-    def wait_want_place_figure(self):
-        game_logger.debug("Wait for place figure")
-        while self.running:
-            self.wait_for_message()
-            if self.place_figure is not None:
-                return True
-            if self.move_figure is not None:
-                return False
-
-    def wait_dice_message(self):
-        while self.running:
-            self.wait_for_message()
-            if self.roll is not None:
-                rolled_value = self.roll
-                self.roll = None
-                return rolled_value
-
-    def wait_for_message(self):
-        connection_list = [conn.sock for conn in self.connections]
-        read_sockets, _, _ = select.select(connection_list, [], [])  # !TODO change to poll()
-
-        for sock in read_sockets:
-            self.handle_msg(sock)
+            self.running = False
+
+        game_logger.debug("Player data after turn: start figures: {}, finished figures: {}".format(
+            reveal_name(player.start_figures), reveal_name(player.finished_figures)))
 
     def rcv_place_figure(self):
         self.place_figure = self.received_tlv[TLV_PLACEFIGURE_TAG]
@@ -141,21 +118,54 @@ class GameThread(threading.Thread):
 
         # refactoring
         tags_dict = self.get_roll_options_dict(self.roll, self.current_player)
+        self.roll_options = dict(tags_dict)
         tags_dict[TLV_ROLLDICERESULT_TAG] = str(self.roll)
         self.connections[connection_index].snd_ack_dict_notification(tags_dict) # OK, ROLLDICERESULT, and options
 
+    def broadcast(self, tlv, connections=None):
+        """Send the same TLV message to all connected players (or to connections). Message is encoded
+        once per framing version and every connection queues the same frame"""
+        for conn in self.connections if connections is None else connections:
+            conn.send_tlv(tlv)
+
     def snd_msg_to_all(self, msg):
         """Send message to all connected players"""
         game_logger.debug("Send msg to all: {}".format(msg))
-        for conn in self.connections:
-            tlv = add_tlv_tag(TLV_INFO_TAG, msg)
-            sendTlv(conn.sock, tlv)
+        self.broadcast(add_tlv_tag(TLV_INFO_TAG, msg))
 
     def snd_player_status(self, player):
         conn = self.connections[self.player_name_to_connection[player.name]]
+        if conn.protocol >= PROTOCOL_V2:    # client shows the board it builds from board messages
+            return
         conn.snd_notification(TLV_INFO_TAG, self.game.get_player_status(player))
         game_logger.debug("Send player status notification")
 
+    def get_board_fields(self):
+        """ Protocol v1 players get the board as text in one value, board of their game is smaller """
+        if all(conn.protocol >= PROTOCOL_V2 for conn in self.connections):
+            return BOARD_FIELDS
+        return min(BOARD_FIELDS, V1_BOARD_FIELDS_MAX)
+
+    def get_board_subscribers(self):
+        """ Players that receive board state instead of the text board (protocol v2 clients) """
+        return [conn for conn in self.connections if conn.protocol >= PROTOCOL_V2]
+
+    def send_board_snapshot(self):
+        subscribers = self.get_board_subscribers()
+        self.board_positions = get_positions(self.game)
+        if subscribers:
+            self.broadcast(build_tlv_with_tags({TLV_BOARD_TAG: snapshot_entries(self.game, self.board_positions)}),
+                           subscribers)
+
+    def send_board_delta(self):
+        """ Send changes of the board since the last board message """
+        positions = get_positions(self.game)
+        entries = delta_entries(self.board_positions, positions)
+        self.board_positions = positions
+        subscribers = self.get_board_subscribers()
+        if entries and subscribers:
+            self.broadcast(build_tlv_with_tags({TLV_BOARD_DELTA_TAG: entries}), subscribers)
+
     def get_game_status(self):
         running = "YES" if self.running else "NO"
         msg = """
@@ -168,37 +178,33 @@ class GameThread(threading.Thread):
         """Close all the sockets"""
         for conn in self.connections:
             game_logger.info("Close connection {}".format(conn))
-            conn.sock.close()
+            conn.close()
         conn = self.connections[0]
         conn.room_manager.close_room(conn.cli.rnum)
 
     def send_new_turn_started(self, player_name):
         game_logger.debug("send_new_turn_started for player {}".format(player_name))
-        for conn in self.connections:
-            conn.snd_notification(TLV_NEWTURN_TAG, player_name)  #{}\n".format(self.game.game_board.display_board()))
+        self.broadcast(add_tlv_tag(TLV_NEWTURN_TAG, player_name))
 
     def send_game_started(self):
-        for conn in self.connections:
-            conn.snd_notification(TLV_STARTED_TAG, "\n*****Game Started*****\n")
+        self.broadcast(add_tlv_tag(TLV_STARTED_TAG, "\n*****Game Started*****\n"))
 
     def clear_before_turn(self):
         self.place_figure = None
         self.move_figure = None
         self.roll = None
+        self.roll_options = {}
         self.received_tlv = None
 
-    def send(self, sock, tag, msg=""):       # handle OSError on higher level!
-        """Send message that contains control message"""
-        tlv = add_tlv_tag(tag, msg)
-        sendTlv(sock, tlv)
+    def is_valid_choice(self):
+        """ Returns True if figure chosen by the player is one of the options sent with the roll result """
+        if self.place_figure is not None:
+            return TLV_OPTION_PUT in self.roll_options
+        return self.move_figure in self.roll_options.get(TLV_OPTION_MOVE, [])
 
-    def handle_msg(self, sock):
-        if self.connections[self.next_player].sock == sock:
-            game_logger.debug("Player {} move".format(self.next_player))
-        else:
-            game_logger.debug("Special msg received")
-        self.received_tlv = recvTlv(sock)
-        # print(self.received_tlv)
+    def handle_tlv(self, tlv):
+        """ Call handler for every tag in received message """
+        self.received_tlv = tlv
         msg_types = get_types(self.received_tlv)
         for type in msg_types:
             try:
@@ -229,4 +235,357 @@ class GameThread(threading.Thread):
                 msg_tags[TLV_OPTION_SKIP] = "."
                 self.skip_turn = True
 
-        return msg_tags
\ No newline at end of file
+        return msg_tags
+
+
+class GameSession(BaseGame):
+    """
+    Game as a state machine driven by the loop that reads players' connections
+    (server loop, GameWorker or asyncio).
+    Every received message moves the game forward, nothing blocks and there is no thread per game,
+    so a running game costs only its state.
+    """
+
+    def __init__(self, connections, rnum):
+        super().__init__(connections, rnum)
+        self.state = None
+        self.turn_roll = None       # dice result of the current turn
+        self.timers = None          # TimerWheel of the loop that runs the game
+        self.turn_timer = None
+
+    def start(self):
+        for conn in self.connections:
+            conn.game = self
+        self.timers = self.connections[0].timers
+        try:
+            self.running = True
+            self.snd_msg_to_all(self.get_game_status())
+            self.game.start_game()
+            self.send_board_snapshot()
+            self.start_turn()
+        except (OSError, ClearClientException) as e:
+            game_logger.error("[ERROR-GAME] Error while starting the game: {}".format(str(e)))
+            self.stop()
+        except Exception as e:
+            self.fail(e)
+
+    def handle_msg(self, conn, tlv):
+        """ Called by the loop for every message received from one of the players. Only the current
+        player's messages the game waits for are handled, the others are ignored """
+        if not self.running:
+            return
+        if conn is not self.get_connection(self.current_player):
+            game_logger.warning("[GAME] {} sent a message out of turn: {}".format(conn.cli.name, tlv))
+            return
+        expected = {tag: value for tag, value in tlv.items() if tag in STATE_TAGS.get(self.state, ())}
+        if not expected:
+            game_logger.warning("[GAME] Unexpected message from {} in state {}: {}".format(conn.cli.name, self.state, tlv))
+            return
+        try:
+            self.handle_tlv(expected)
+            self.advance()
+        except (OSError, ClearClientException) as e:
+            game_logger.error("[ERROR-GAME] Error while handling message: {}".format(str(e)))
+            self.stop()
+        except Exception as e:      # error in the game logic ends this game only, not the loop that runs it
+            self.fail(e)
+
+    def get_connection(self, player):
+        return self.connections[self.player_name_to_connection[player.name]]
+
+    def player_disconnected(self, conn):
+        """ Game ends if one of the players leaves """
+        if self.running:
+            game_logger.info("Player {} left the game".format(conn.cli.name))
+            self.stop()
+
+    def advance(self):
+        """ Move to the next state if current player sent what the game waits for """
+        player = self.current_player
+        if self.state == WAIT_ROLL and self.roll is not None:
+            self.turn_roll = self.roll
+            self.roll = None
+            if self.skip_turn:  # player cannot move
+                self.next_turn()
+                return
+            self.place_figure = None    # choice is accepted only after the roll
+            self.move_figure = None
+            self.state = WAIT_CHOICE
+
+        elif self.state == WAIT_CHOICE and (self.place_figure is not None or self.move_figure is not None):
+            if not self.is_valid_choice():
+                game_logger.warning("[GAME] {} chose figure that is not an option: place {}, move {}".format(
+                    player.name, self.place_figure, self.move_figure))
+                self.place_figure = None
+                self.move_figure = None
+                self.get_connection(player).snd_notification(TLV_INFO_TAG, "Choose one of the options")
+                return
+            self.end_turn(player, self.turn_roll, self.place_figure is not None)
+            if not self.running:
+                self.state = FINISHED
+                self.cancel_turn_timer()
+                return
+            self.next_turn()
+
+    def start_turn(self):
+        self.cancel_turn_timer()
+        self.begin_turn(self.game.players[self.next_player])
+        self.state = WAIT_ROLL
+        if TURN_TIMEOUT > 0 and self.timers is not None:
+            self.turn_timer = self.timers.schedule(TURN_TIMEOUT, self.turn_timed_out)
+
+    def cancel_turn_timer(self):
+        if self.turn_timer is not None:
+            self.turn_timer.cancel()
+            self.turn_timer = None
+
+    def turn_timed_out(self):
+        """ Timer callback. Player did not finish the turn in TURN_TIMEOUT, play it according to TURN_TIMEOUT_ACTION """
+        self.turn_timer = None
+        if not self.running:
+            return
+        player = self.current_player
+        game_logger.info("Player {} did not finish the turn in {} seconds".format(player.name, TURN_TIMEOUT))
+        try:
+            if TURN_TIMEOUT_ACTION == "move":
+                self.auto_move(player)
+            else:
+                self.snd_msg_to_all("Player {} skipped the turn".format(player.name))
+                self.next_turn()
+        except (OSError, ClearClientException) as e:
+            game_logger.error("[ERROR-GAME] Error while handling turn timeout: {}".format(str(e)))
+            self.stop()
+        except Exception as e:
+            self.fail(e)
+
+    def auto_move(self, player):
+        """ Roll the dice if player has not done it yet and place new figure or move the first one on the board """
+        if self.state == WAIT_ROLL:
+            self.rcv_rol_dice()     # result is sent to the player as if they rolled
+            self.advance()
+            if self.state != WAIT_CHOICE:   # player could not move
+                return
+
+        options = self.get_roll_options_dict(self.turn_roll, player)
+        if TLV_OPTION_PUT in options:
+            self.place_figure = options[TLV_OPTION_PUT][0]
+        else:
+            self.move_figure = options[TLV_OPTION_MOVE][0]
+        self.advance()
+
+    def next_turn(self):
+        self.next_player = (self.next_player + 1) % len(self.game.players)
+        if self.next_player == 0:
+            game_logger.debug("Board fields after turn: {}".format(reveal_name(self.game.game_board.fields)))
+        self.start_turn()
+
+    def stop(self):
+        self.running = False
+        self.state = FINISHED
+        self.cancel_turn_timer()
+        self.close_all()
+
+    def fail(self, error):
+        """ Stop the game after an unexpected error, players are disconnected and the room is closed """
+        game_logger.exception("[ERROR-GAME] Game in room {} failed: {}".format(self.rnum, str(error)))
+        if self.state == FINISHED:
+            return
+        try:
+            self.stop()
+        except Exception as e:
+            game_logger.error("[ERROR-GAME] Error while stopping game in room {}: {}".format(self.rnum, str(e)))
+
+
+class GameWorker(threading.Thread):
+    """
+    Hosts many games in one thread. Connections of all the hosted games are registered
+    in worker's own selector, every message is passed to the GameSession of its connection.
+    """
+
+    def __init__(self, worker_id):
+        super().__init__(name="game-worker-{}".format(worker_id), daemon=True)
+        self.worker_id = worker_id
+        self.selector = selectors.DefaultSelector()
+        self.incoming = deque()     # games assigned by the lobby, not started yet
+        self.games = set()          # running GameSession(s)
+        self.timers = TimerWheel()  # turn timeouts of the hosted games
+        self.write_batch = set()    # connections with messages queued during current iteration
+        self.congested = set()      # slow connections of the hosted games, swept every tick
+        self.running = True
+
+        # lobby wakes up the worker by writing to wakeup_w
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.wakeup_w.setblocking(False)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, None)
+
+        # stats
+        self.messages = 0           # messages handled since start
+        self.loop_lag = 0.0         # max delay of the tick since last get_stats call
+        self.stats_messages = 0
+        self.stats_time = time.monotonic()
+
+    def load(self):
+        return len(self.games) + len(self.incoming)
+
+    def submit(self, game):
+        """ Called by the lobby thread. Connections of the game must not be handled by the lobby anymore """
+        self.incoming.append(game)
+        try:
+            self.wakeup_w.send(b"\0")
+        except BlockingIOError:     # worker has not read previous wakeups yet
+            pass
+
+    def stop(self):
+        self.running = False
+        try:
+            self.wakeup_w.send(b"\0")
+        except OSError:
+            pass
+
+    def run(self):
+        next_tick = time.monotonic() + GAME_WORKER_TICK
+        try:
+            while self.running:
+                timeout = max(next_tick - time.monotonic(), 0)
+                timers_timeout = self.timers.next_timeout()
+                if timers_timeout is not None:
+                    timeout = min(timeout, timers_timeout)
+                events = self.selector.select(timeout)
+                for key, mask in events:
+                    if key.data is None:
+                        self.start_incoming()
+                        continue
+
+                    conn = key.data
+                    if conn.selector is not self.selector:     # closed while handling previous event
+                        continue
+                    try:
+                        if mask & selectors.EVENT_WRITE:
+                            conn.flush()
+                        if mask & selectors.EVENT_READ and conn.selector is self.selector:
+                            conn.decoder.recv_from(conn.sock)
+                            self.handle_frames(conn)
+                    except (EOFError, OSError, ClearClientException) as e:
+                        game_logger.error("[ERROR-GAME] Connection {} error: {}".format(repr(conn.cli), str(e)))
+                        if isinstance(e, ClearClientException):
+                            tracing.dump_error(conn.cli.addr, e)
+                        self.player_left(conn)
+                    except ValueError as e:
+                        game_logger.error("[ERROR] Unknown tag received: {}".format(e))
+                        tracing.dump_error(conn.cli.addr, e)
+                    except Exception as e:
+                        self.game_failed(conn, e)
+
+                self.timers.advance()
+                flush_write_batch(self.write_batch, self.write_failed)
+                now = time.monotonic()
+                if now >= next_tick:
+                    self.loop_lag = max(self.loop_lag, now - next_tick)
+                    self.check_slow_clients()
+                    self.games = {game for game in self.games if game.running}
+                    next_tick = now + GAME_WORKER_TICK
+        finally:
+            self.selector.close()
+            self.wakeup_r.close()
+            self.wakeup_w.close()
+
+    def start_incoming(self):
+        """ Take over connections of the games assigned by the lobby and start the games """
+        try:
+            while self.wakeup_r.recv(RCV_BUFFSIZE):
+                pass
+        except BlockingIOError:
+            pass
+
+        while self.incoming:
+            game = self.incoming.popleft()
+            for conn in game.connections:
+                conn.attach(self.selector, self.timers, self.write_batch, self.congested)
+            self.games.add(game)
+            game.start()
+            game_logger.info("Worker {} hosts game in room {}".format(self.worker_id, game.rnum))
+            for conn in game.connections:   # messages received by the lobby after the start request
+                try:
+                    self.handle_frames(conn)
+                except Exception as e:
+                    self.game_failed(conn, e)
+
+    def handle_frames(self, conn):
+        tlv = conn.decoder.next_frame()
+        while tlv is not None and conn.selector is self.selector:
+            self.messages += 1
+            conn.game.handle_msg(conn, tlv)
+            tlv = conn.decoder.next_frame()
+
+    def write_failed(self, conn, e):
+        game_logger.error("[ERROR-GAME] Connection {} error: {}".format(repr(conn.cli), str(e)))
+        if conn.selector is self.selector:
+            self.player_left(conn)
+
+    def game_failed(self, conn, error):
+        """ Unexpected error while handling the connection stops only its game, the worker keeps hosting the others """
+        if conn.game is not None:
+            conn.game.fail(error)
+        else:
+            game_logger.exception("[ERROR-GAME] Worker {} connection {} error: {}".format(
+                self.worker_id, repr(conn.cli), str(error)))
+        if conn.selector is self.selector:
+            conn.close(timeout=0)
+
+    def player_left(self, conn):
+        if conn.game is not None:
+            conn.game.player_disconnected(conn)
+        conn.close(timeout=0)
+
+    def check_slow_clients(self):
+        """ Disconnect players that do not read their messages and finish closing connections """
+        for conn in list(self.congested):
+            if conn.selector is not self.selector:
+                self.congested.discard(conn)
+                continue
+            try:
+                conn.check_slow()
+            except ClearClientException as e:
+                game_logger.error("Slow client {}: {} {}".format(repr(conn.cli), str(e), conn.get_send_stats()))
+                self.player_left(conn)
+
+    def get_stats(self):
+        """ Returns games hosted, messages per second and loop lag since previous call """
+        now = time.monotonic()
+        messages = self.messages
+        stats = {
+            "worker": self.worker_id,
+            "games": sum(1 for game in self.games if game.running),
+            "msgs_per_sec": round((messages - self.stats_messages) / max(now - self.stats_time, 1e-6), 1),
+            "loop_lag": round(self.loop_lag, 4),
+        }
+        self.stats_messages = messages
+        self.stats_time = now
+        self.loop_lag = 0.0
+        return stats
+
+
+class GameWorkerPool:
+    """ Fixed number of GameWorker threads. New game is assigned to the worker that hosts the fewest games. """
+
+    def __init__(self, nworkers):
+        self.workers = [GameWorker(i) for i in range(nworkers)]
+        for worker in self.workers:
+            worker.start()
+
+    def assign(self, game):
+        """ Called by the lobby. Move game's connections from the lobby loop to the least loaded worker """
+        for conn in game.connections:
+            conn.unsubscribe()
+        workers = [worker for worker in self.workers if worker.is_alive()] or self.workers
+        worker = min(workers, key=GameWorker.load)
+        worker.submit(game)
+        return worker
+
+    def get_stats(self):
+        return [worker.get_stats() for worker in self.workers]
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
@@ -0,0 +1,85 @@
+import math
+import time
+from settings import TIMER_TICK, TIMER_WHEEL_SLOTS
+from game.logger_conf import server_logger
+
+
+class Timer:
+    """ Callback scheduled in TimerWheel. Cancelled timer stays in its slot until the wheel reaches it. """
+
+    __slots__ = ("callback", "args", "rounds", "cancelled")
+
+    def __init__(self, callback, args, rounds):
+        self.callback = callback
+        self.args = args
+        self.rounds = rounds        # full turns of the wheel left before the timer expires
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel driven by an event loop: the loop waits at most next_timeout() seconds
+    and calls advance() after handling its events. Timer is appended to the slot it expires in,
+    so schedule and cancel are O(1) and every timer is visited once per turn of the wheel.
+    Timers are precise to one tick and run in the loop's thread.
+    """
+
+    def __init__(self, tick=TIMER_TICK, nslots=TIMER_WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(nslots)]
+        self.current = 0        # slot that expires at last_tick + tick
+        self.last_tick = time.monotonic()
+        self.count = 0          # timers in the wheel, cancelled ones included
+
+    def schedule(self, delay, callback, *args):
+        """
+        Call callback(*args) after delay seconds.
+        :param delay:       (float)     : seconds
+        :param callback:    (callable)  : function to call
+        :return:            (Timer)     : timer that can be cancelled
+        """
+        now = time.monotonic()
+        if not self.count:      # wheel was not ticking, start from now
+            self.last_tick = now
+        ticks = max(1, math.ceil((now + delay - self.last_tick) / self.tick))
+        nslots = len(self.slots)
+        timer = Timer(callback, args, (ticks - 1) // nslots)
+        self.slots[(self.current + ticks - 1) % nslots].append(timer)
+        self.count += 1
+        return timer
+
+    def next_timeout(self):
+        """ Returns seconds to the next tick, None if there are no timers """
+        if not self.count:
+            return None
+        return max(self.last_tick + self.tick - time.monotonic(), 0)
+
+    def advance(self):
+        """ Run callbacks of all the timers that have expired """
+        now = time.monotonic()
+        while self.count and now >= self.last_tick + self.tick:
+            index = self.current
+            slot = self.slots[index]
+            self.slots[index] = []
+            # move the wheel first, callbacks can schedule new timers
+            self.current = (index + 1) % len(self.slots)
+            self.last_tick += self.tick
+
+            for timer in slot:
+                if timer.cancelled:
+                    self.count -= 1
+                elif timer.rounds:
+                    timer.rounds -= 1
+                    self.slots[index].append(timer)
+                else:
+                    self.count -= 1
+                    try:
+                        timer.callback(*timer.args)
+                    except Exception as e:
+                        server_logger.error(f"Timer callback {timer.callback} failed: {str(e)}")
+
+        if not self.count:
+            self.last_tick = now
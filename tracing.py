@@ -0,0 +1,86 @@
+"""
+Frame tracing of the network layer. Sent and received frames are kept as they are (bytes, nothing
+formatted) in a fixed size ring buffer in memory, so the hot path only appends a tuple. The buffer
+is written to the network log on demand (SIGUSR1 to the server) or when a connection fails with
+a protocol error.
+
+Callers check the flag first, disabled tracing costs one attribute lookup per frame:
+    if tracing.enabled:
+        tracing.record(tracing.SENT, peer, protocol, frame)
+"""
+import struct
+import time
+from collections import deque
+from settings import TRACE_FRAMES, TRACE_BUFFER_SIZE
+from game.logger_conf import network_logger
+
+SENT = ">"
+RECEIVED = "<"
+
+enabled = TRACE_FRAMES
+frames = deque(maxlen=TRACE_BUFFER_SIZE)    # (time, direction, peer, protocol, frame), oldest first
+
+
+def enable(size=TRACE_BUFFER_SIZE):
+    """
+    Start recording frames.
+    @param size:    (int)   : number of the last frames kept
+    """
+    global enabled, frames
+    if size != frames.maxlen:
+        frames = deque(frames, maxlen=size)
+    enabled = True
+
+
+def disable():
+    """ Stop recording, frames recorded so far are kept until the next dump """
+    global enabled
+    enabled = False
+
+
+def record(direction, peer, protocol, frame):
+    """
+    Keep the frame in the ring buffer, the oldest frame is dropped when it is full.
+    @param direction:   (str)   : SENT or RECEIVED
+    @param peer:        (tuple) : address of the other side, None on the client
+    @param protocol:    (int)   : framing version of the frame
+    @param frame:       (bytes) : whole frame with length header, not compressed
+    """
+    frames.append((time.time(), direction, peer, protocol, bytes(frame)))
+
+
+def dump(reason, peer=None):
+    """
+    Write recorded frames to the network log, oldest first, and clear the buffer.
+    @param reason:  (str)   : written before the frames
+    @param peer:    (tuple) : write only frames of this connection, all if None
+    """
+    entries = frames.copy()     # game workers may record while the frames are formatted
+    if peer is None:
+        frames.clear()
+    else:
+        entries = [entry for entry in entries if entry[2] == peer]
+    network_logger.info(f"Frame trace, {reason}: {len(entries)} frames")
+    for when, direction, frame_peer, protocol, frame in entries:
+        network_logger.info("%s.%03d %s %s v%d %s", time.strftime("%H:%M:%S", time.localtime(when)),
+                            int(when * 1000) % 1000, direction, frame_peer or "-", protocol,
+                            describe_frame(protocol, frame))
+
+
+def dump_error(peer, error):
+    """ Dump frames of the connection that failed with a protocol error, if tracing is enabled """
+    if enabled:
+        dump(f"{peer}: {error}", peer)
+
+
+def describe_frame(protocol, frame):
+    """ Returns decoded frame, or the bytes if it can not be decoded (that may be why it is dumped) """
+    from common import PROTOCOL_V1, LENGTH_LEN, V2_LENGTH, V2_COMPRESSED, decode_tlv, decode_tlv_v2
+    try:
+        if protocol == PROTOCOL_V1:
+            return decode_tlv(frame[LENGTH_LEN:].decode("utf-8"))
+        if V2_LENGTH.unpack_from(frame)[0] & V2_COMPRESSED:
+            return f"compressed {len(frame)} bytes"
+        return decode_tlv_v2(frame[V2_LENGTH.size:])
+    except (ValueError, struct.error) as e:     # UnicodeDecodeError is a ValueError
+        return f"{frame!r} ({e})"